@@ -1622,6 +1622,8 @@ int main(int argc, char **argv) {
                 "--think",              // Python server 支持
                 "--hide_input",         // Python server 支持
                 "--dev_mode",           // Python server 支持
+                "--sse_flush_ms",       // Python server 支持
+                "--enable_cors",        // Python server 支持
 
                 // ===== MOE / 设备配置 =====
                 // "--moe_device",      // C++ apiserver 已支持
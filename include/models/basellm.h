@@ -68,7 +68,8 @@ namespace fastllm {
     using LogCallback = std::function<void(const LogData&)>;
 
     // 全局日志回调注册
-    void SetLogCallback(LogCallback callback);
+    // eventMask: 按 LogEvent 序号的位掩码，未置位的事件不会调用回调
+    void SetLogCallback(LogCallback callback, unsigned int eventMask = 0xFFFFFFFFu);
     LogCallback GetLogCallback();
     
     // 便捷日志函数（内部使用）
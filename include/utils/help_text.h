@@ -83,6 +83,7 @@ static const ParamGroup PARAM_GROUPS[] = {
         {"--dtype <类型>",        "float16, int8, int4, int4g",      "dtype",      "str",  "auto"},
         {"-t, --threads <数量>",  "CPU 线程数",                      "threads",    "int",  "-1"},
         {"--model_name <名称>",   "模型显示名称 (用于 API 返回)",    "model_name", "str",  nullptr},
+        {"--max_history <数量>",  "对话保留的最大轮数 (run/chat)",   "max_history", "int", "20"},
     }},
     {"服务器参数", {
         {"--host <地址>",         "监听地址 (默认: 127.0.0.1)",      "host",       "str",  "127.0.0.1"},
@@ -90,6 +91,8 @@ static const ParamGroup PARAM_GROUPS[] = {
         {"--api_key <密钥>",      "API 密钥认证 (Bearer Token)",     "api_key",    "str",  nullptr},
         {"--embedding_path <路径>", "Embedding 模型路径",            "embedding_path", "str", nullptr},
         {"--dev_mode",            "开发模式 (启用调试接口)",         "dev_mode",   "bool", nullptr},
+        {"--sse_flush_ms <毫秒>", "流式输出合并发送的最长等待 (0 为逐帧发送)", "sse_flush_ms", "int", "5"},
+        {"--enable_cors",         "启用 CORS 跨域支持 (浏览器直连时需要, 开发模式下默认启用)", "enable_cors", "bool", nullptr},
     }},
     {"Batch / 并发参数", {
         {"--batch <数量>",        "批处理大小",                      "max_batch",  "int",  "-1"},
@@ -7,7 +7,6 @@ FastLLM Python 日志回调模块
 import sys
 import time
 from typing import Optional, Callable
-from dataclasses import dataclass
 from enum import Enum
 
 try:
@@ -35,113 +34,245 @@ class LogEvent(Enum):
     GENERAL = 6
 
 
-@dataclass
 class InferenceStats:
     """推理统计信息"""
-    input_tokens: int = 0
-    output_tokens: int = 0
-    prefill_time: float = 0.0
-    decode_time: float = 0.0
-    total_time: float = 0.0
-    
+    __slots__ = ("input_tokens", "output_tokens", "prefill_time", "decode_time", "total_time")
+
+    def __init__(self, input_tokens: int = 0, output_tokens: int = 0, prefill_time: float = 0.0,
+                 decode_time: float = 0.0, total_time: float = 0.0):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.prefill_time = prefill_time
+        self.decode_time = decode_time
+        self.total_time = total_time
+
     @property
     def prefill_speed(self) -> float:
         """预填充速度 (tokens/s)"""
         return self.input_tokens / self.prefill_time if self.prefill_time > 0 else 0
-    
+
     @property
     def decode_speed(self) -> float:
         """解码速度 (tokens/s)"""
         return self.output_tokens / self.decode_time if self.decode_time > 0 else 0
-    
+
     @property
     def total_speed(self) -> float:
         """总体速度 (tokens/s)"""
         return (self.input_tokens + self.output_tokens) / self.total_time if self.total_time > 0 else 0
 
+    def __repr__(self) -> str:
+        return (f"InferenceStats(input_tokens={self.input_tokens}, output_tokens={self.output_tokens}, "
+                f"prefill_time={self.prefill_time}, decode_time={self.decode_time}, total_time={self.total_time})")
+
+
+class _State:
+    """日志回调共享的运行时状态（时间均基于 time.monotonic）"""
+    __slots__ = ("stats", "inf_start", "pf_start")
+
+    def __init__(self):
+        self.stats = InferenceStats()
+        self.inf_start: Optional[float] = None
+        self.pf_start: Optional[float] = None
+
 
 # 全局统计信息
-_current_stats = InferenceStats()
-_inference_start_time: Optional[float] = None
-_prefill_start_time: Optional[float] = None
+_ST = _State()
 
+# GENERAL 事件的日志级别名称映射，首次使用时构建
+_LEVEL_STR: Optional[dict] = None
 
-def _default_log_handler(log_data) -> None:
-    """
-    默认的日志处理函数，显示推理统计信息
-    """
-    global _current_stats, _inference_start_time, _prefill_start_time
-    
-    event = log_data.event
-    
-    if event == pyfastllm.LogEvent.PREFILL_PROGRESS:
-        if log_data.total > 0:
-            progress = log_data.current / log_data.total * 100
-            speed = log_data.speed if log_data.speed > 0 else 0
-            print(f"\r[Prefill] {log_data.current}/{log_data.total} ({progress:.1f}%) - {speed:.1f} tokens/s", 
-                  end='', flush=True)
-            
-    elif event == pyfastllm.LogEvent.PREFILL_COMPLETE:
-        if _prefill_start_time:
-            _current_stats.prefill_time = time.time() - _prefill_start_time
-        _current_stats.input_tokens = log_data.total
-        print(f"\n[Prefill Complete] {log_data.total} tokens in {_current_stats.prefill_time:.2f}s "
-              f"({_current_stats.prefill_speed:.1f} tokens/s)")
-        
-    elif event == pyfastllm.LogEvent.BATCH_STATUS:
-        print(f"[Batch] Active: {log_data.active}, Pending: {log_data.pending}")
-        
-    elif event == pyfastllm.LogEvent.GENERAL:
-        level_str = {
+
+def _level_map() -> dict:
+    """获取 pyfastllm.LogLevel -> 级别名称的映射"""
+    global _LEVEL_STR
+    if _LEVEL_STR is None:
+        _LEVEL_STR = {
             pyfastllm.LogLevel.DEBUG: "DEBUG",
             pyfastllm.LogLevel.INFO: "INFO",
             pyfastllm.LogLevel.WARNING: "WARN",
             pyfastllm.LogLevel.ERROR: "ERROR"
-        }.get(log_data.level, "INFO")
-        print(f"[{level_str}] {log_data.tag}: {log_data.message}")
-        
-    elif event == pyfastllm.LogEvent.KVCACHE_CONFIG:
-        print(f"[KVCache] {log_data.message}")
-        
-    elif event == pyfastllm.LogEvent.KVCACHE_HIT:
-        print(f"[KVCache Hit] {log_data.message}")
-        
-    elif event == pyfastllm.LogEvent.KVCACHE_MISS:
-        print(f"[KVCache Miss] {log_data.message}")
-
-
-def _simple_log_handler(log_data) -> None:
+        }
+    return _LEVEL_STR
+
+
+def _write_raw(data: bytes) -> None:
     """
-    简单的日志处理函数，只显示关键信息
+    直接写 stdout 的底层二进制缓冲，绕过 TextIOWrapper 的编码；
+    BufferedWriter 会处理部分写入。没有二进制缓冲时（如 Jupyter、重定向到 StringIO）退回普通写入
     """
-    global _current_stats, _prefill_start_time
-    
-    event = log_data.event
-    
-    if event == pyfastllm.LogEvent.PREFILL_PROGRESS:
-        _prefill_start_time = _prefill_start_time or time.time()
-        
-    elif event == pyfastllm.LogEvent.PREFILL_COMPLETE:
-        if _prefill_start_time:
-            elapsed = time.time() - _prefill_start_time
-            speed = log_data.total / elapsed if elapsed > 0 else 0
-            print(f"[Prefill] {log_data.total} tokens ({speed:.1f} t/s)")
-            _prefill_start_time = None
-
-
-def enable_logging(verbose: bool = True) -> None:
+    out = sys.stdout
+    buf = getattr(out, "buffer", None)
+    if buf is None:
+        out.write(data.decode("utf-8"))
+        out.flush()
+        return
+    # 先刷出之前 print 的文本缓冲内容，保证输出顺序
+    out.flush()
+    buf.write(data)
+    buf.flush()
+
+
+def _on_prefill_progress(log_data) -> None:
+    # 输出频率由 enable_logging 的 min_interval_ms 统一控制，这里不再额外节流
+    if log_data.total > 0:
+        progress = log_data.current / log_data.total * 100
+        speed = log_data.speed if log_data.speed > 0 else 0
+        _write_raw(f"\r[Prefill] {log_data.current}/{log_data.total} ({progress:.1f}%) - {speed:.1f} tokens/s".encode())
+
+
+def _on_prefill_complete(log_data) -> None:
+    st = _ST
+    if st.pf_start:
+        st.stats.prefill_time = time.monotonic() - st.pf_start
+    st.stats.input_tokens = log_data.total
+    print(f"\n[Prefill Complete] {log_data.total} tokens in {st.stats.prefill_time:.2f}s "
+          f"({st.stats.prefill_speed:.1f} tokens/s)")
+
+
+def _on_batch_status(log_data) -> None:
+    print(f"[Batch] Active: {log_data.active}, Pending: {log_data.pending}")
+
+
+def _on_general(log_data) -> None:
+    level_str = _level_map().get(log_data.level, "INFO")
+    print(f"[{level_str}] {log_data.tag}: {log_data.message}")
+
+
+def _on_kvcache_config(log_data) -> None:
+    print(f"[KVCache] {log_data.message}")
+
+
+def _on_kvcache_hit(log_data) -> None:
+    print(f"[KVCache Hit] {log_data.message}")
+
+
+def _on_kvcache_miss(log_data) -> None:
+    print(f"[KVCache Miss] {log_data.message}")
+
+
+def _on_ignored(log_data) -> None:
+    pass
+
+
+# 事件 -> 处理函数的分发表，首次使用时构建
+_HANDLERS: Optional[dict] = None
+
+
+def _handler_map() -> dict:
+    """获取 pyfastllm.LogEvent -> 处理函数的分发表"""
+    global _HANDLERS
+    if _HANDLERS is None:
+        _HANDLERS = {
+            pyfastllm.LogEvent.PREFILL_PROGRESS: _on_prefill_progress,
+            pyfastllm.LogEvent.PREFILL_COMPLETE: _on_prefill_complete,
+            pyfastllm.LogEvent.BATCH_STATUS: _on_batch_status,
+            pyfastllm.LogEvent.GENERAL: _on_general,
+            pyfastllm.LogEvent.KVCACHE_CONFIG: _on_kvcache_config,
+            pyfastllm.LogEvent.KVCACHE_HIT: _on_kvcache_hit,
+            pyfastllm.LogEvent.KVCACHE_MISS: _on_kvcache_miss,
+        }
+    return _HANDLERS
+
+
+def _make_default_log_handler() -> Callable:
+    """
+    生成默认的日志处理函数，显示推理统计信息
+
+    分发表在注册时绑定为局部变量，回调中不再查找 pyfastllm 模块属性
+    """
+    dispatch = _handler_map().get
+    ignored = _on_ignored
+
+    def _default_log_handler(log_data) -> None:
+        dispatch(log_data.event, ignored)(log_data)
+    return _default_log_handler
+
+
+def _make_simple_log_handler() -> Callable:
+    """
+    生成简单的日志处理函数，只显示关键信息（只需要 PREFILL_PROGRESS / PREFILL_COMPLETE 事件）
+    """
+    st = _ST
+    EV_PP = pyfastllm.LogEvent.PREFILL_PROGRESS
+    EV_PC = pyfastllm.LogEvent.PREFILL_COMPLETE
+    monotonic = time.monotonic
+
+    def _simple_log_handler(log_data) -> None:
+        event = log_data.event
+
+        if event == EV_PP:
+            st.pf_start = st.pf_start or monotonic()
+
+        elif event == EV_PC:
+            if st.pf_start:
+                elapsed = monotonic() - st.pf_start
+                speed = log_data.total / elapsed if elapsed > 0 else 0
+                print(f"[Prefill] {log_data.total} tokens ({speed:.1f} t/s)")
+                st.pf_start = None
+    return _simple_log_handler
+
+
+def _coalesced(handler: Callable, min_interval_ms: int, events) -> Callable:
+    """
+    包装处理函数：events 中的事件在 min_interval_ms 内只转发一次（进度完成时总是转发）
+    """
+    min_interval = min_interval_ms / 1000.0
+    events = frozenset(events)
+    last_emit = {}
+
+    def wrapper(log_data) -> None:
+        event = log_data.event
+        if event in events and log_data.current < log_data.total:
+            now = time.monotonic()
+            last = last_emit.get(event)
+            if last is not None and now - last < min_interval:
+                return
+            last_emit[event] = now
+        handler(log_data)
+    return wrapper
+
+
+def _event_mask(*events) -> int:
+    """根据事件列表生成 set_log_callback 的 event_mask"""
+    mask = 0
+    for event in events:
+        mask |= 1 << int(event.value)
+    return mask
+
+
+def _set_callback(handler: Optional[Callable], event_mask: Optional[int] = None) -> None:
+    """注册回调；旧版本 pyfastllm 不支持 event_mask 时退回全量回调"""
+    if event_mask is None:
+        pyfastllm.set_log_callback(handler)
+        return
+    try:
+        pyfastllm.set_log_callback(handler, event_mask=event_mask)
+    except TypeError:
+        pyfastllm.set_log_callback(handler)
+
+
+def enable_logging(verbose: bool = True, min_interval_ms: int = 50) -> None:
     """
     启用日志回调
     
     Args:
         verbose: True 使用详细日志，False 使用简单日志
+        min_interval_ms: PREFILL_PROGRESS 事件的最小回调间隔（毫秒），0 表示不合并
     """
     if pyfastllm is None:
         print("Warning: pyfastllm not available, logging disabled")
         return
     
-    handler = _default_log_handler if verbose else _simple_log_handler
-    pyfastllm.set_log_callback(handler)
+    E = pyfastllm.LogEvent
+    if verbose:
+        handler, event_mask = _make_default_log_handler(), None
+    else:
+        # 简单日志只关心预填充事件，其余事件在 C++ 端直接过滤，不再回调到 Python
+        handler, event_mask = _make_simple_log_handler(), _event_mask(E.PREFILL_PROGRESS, E.PREFILL_COMPLETE)
+    if min_interval_ms > 0:
+        handler = _coalesced(handler, min_interval_ms, (E.PREFILL_PROGRESS,))
+    _set_callback(handler, event_mask)
 
 
 def disable_logging() -> None:
@@ -150,20 +281,21 @@ def disable_logging() -> None:
         pyfastllm.set_log_callback(None)
 
 
-def set_custom_handler(handler: Callable) -> None:
+def set_custom_handler(handler: Callable, event_mask: Optional[int] = None) -> None:
     """
     设置自定义日志处理函数
     
     Args:
         handler: 接收 LogData 对象的回调函数
+        event_mask: 需要回调的事件位掩码（第 N 位对应 LogEvent 值 N），None 表示全部事件
     """
     if pyfastllm is not None:
-        pyfastllm.set_log_callback(handler)
+        _set_callback(handler, event_mask)
 
 
 def get_current_stats() -> InferenceStats:
     """获取当前推理统计信息"""
-    return _current_stats
+    return _ST.stats
 
 
 # 为了兼容性，提供模块级函数
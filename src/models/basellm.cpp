@@ -18,9 +18,11 @@ namespace fastllm {
     // 日志回调系统实现
     // ============================================================================
     static LogCallback g_logCallback = nullptr;
+    static unsigned int g_logEventMask = 0xFFFFFFFFu;
 
-    void SetLogCallback(LogCallback callback) {
+    void SetLogCallback(LogCallback callback, unsigned int eventMask) {
         g_logCallback = callback;
+        g_logEventMask = eventMask;
     }
 
     LogCallback GetLogCallback() {
@@ -28,7 +30,7 @@ namespace fastllm {
     }
 
     void EmitLog(const LogData& logData) {
-        if (g_logCallback) {
+        if (g_logCallback && ((g_logEventMask >> static_cast<int>(logData.event)) & 1u)) {
             g_logCallback(logData);
         }
     }
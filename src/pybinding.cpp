@@ -472,8 +472,10 @@ PYBIND11_MODULE(pyfastllm, m) {
       [](fastllm::LogData& d, const std::string& v) { d.data.device = v; });
 
   // 日志回调设置函数
-  m.def("set_log_callback", &fastllm::SetLogCallback, "Set the global log callback function",
-        py::arg("callback"));
+  m.def("set_log_callback", [](fastllm::LogCallback callback, unsigned int eventMask) {
+          fastllm::SetLogCallback(callback, eventMask);
+        }, "Set the global log callback function; events whose bit is cleared in event_mask are skipped",
+        py::arg("callback"), py::arg("event_mask") = 0xFFFFFFFFu);
   m.def("get_log_callback", &fastllm::GetLogCallback, "Get the current log callback function");
 
   // high level
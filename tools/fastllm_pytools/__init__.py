@@ -1,19 +1,41 @@
-__all__ = ["llm", "LogLevel", "LogEvent", "LogHandlers", 
+__all__ = ["llm", "LogLevel", "LogEvent", "LogHandlers",
            "set_log_callback", "clear_log_callback",
            "enable_pretty_logging", "enable_simple_logging", "disable_logging"]
 
-try:
-    from importlib.metadata import version
-    __version__ = version("ftllm")  # 从安装的元数据读取
-except:
+# 日志相关接口来自 llm 模块（会加载原生库），首次访问时才导入，
+# 使 `ftllm --help` 等不需要推理的命令无需加载 dll / so
+_LLM_EXPORTS = frozenset((
+    "LogLevel", "LogEvent", "LogHandlers",
+    "set_log_callback", "clear_log_callback",
+    "enable_pretty_logging", "enable_simple_logging", "disable_logging"
+))
+
+
+def _get_version():
     try:
-        __version__ = version("ftllm-rocm")
+        from importlib.metadata import version
+        return version("ftllm")  # 从安装的元数据读取
     except:
-        __version__ = "0.1.5.1"
+        try:
+            return version("ftllm-rocm")
+        except:
+            return "0.1.5.1"
+
+
+def __getattr__(name):
+    if name == "llm":
+        import importlib
+        value = importlib.import_module(".llm", __name__)
+    elif name in _LLM_EXPORTS:
+        from . import llm
+        value = getattr(llm, name)
+    elif name == "__version__":
+        value = _get_version()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
 
-# 导出日志相关接口
-from .llm import (
-    LogLevel, LogEvent, LogHandlers,
-    set_log_callback, clear_log_callback,
-    enable_pretty_logging, enable_simple_logging, disable_logging
-)
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | _LLM_EXPORTS | {"llm", "__version__"})
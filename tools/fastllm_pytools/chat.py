@@ -1,7 +1,11 @@
-import argparse
+import sys
+import time
 from .util import make_normal_parser
 from . import console
-import readline
+
+# 流式输出的批量刷新阈值
+_FLUSH_CHARS = 256
+_FLUSH_INTERVAL = 0.05
 
 def args_parser():
     parser = make_normal_parser('fastllm_chat')
@@ -10,6 +14,12 @@ def args_parser():
 
 def fastllm_chat(args):
     from .util import make_normal_llm_model
+    # 仅在交互式终端中启用 readline 行编辑，管道输入时跳过
+    if sys.stdin.isatty():
+        try:
+            import readline  # noqa: F401
+        except ImportError:
+            pass
     
     console.header("加载模型")
     model = make_normal_llm_model(args)
@@ -22,17 +32,26 @@ def fastllm_chat(args):
     }
     import os
     import json
-    if (os.path.exists(os.path.join(args.path, "generation_config.json"))):
-        with open(os.path.join(args.path, "generation_config.json"), "r", encoding="utf-8") as file:
+    gen_path = os.path.join(args.path, "generation_config.json")
+    if (os.path.exists(gen_path)):
+        with open(gen_path, "r", encoding="utf-8") as file:
             config = json.load(file)
             if ('do_sample' in config and config['do_sample']):
                 for it in ["repetition_penalty", "top_p", "top_k", "temperature"]:
                     if (it in config):
                         generation_config[it] = config[it];
+    # 采样参数在整个对话中不变，只构建一次
+    gen_kwargs = {
+        'repeat_penalty': generation_config["repetition_penalty"],
+        'top_p': generation_config["top_p"],
+        'top_k': generation_config["top_k"],
+        'temperature': generation_config["temperature"]
+    }
 
     console.header("开始对话")
     console.info("输入 'clear' 清空记录, 'stop' 退出程序")
     history = []
+    max_history = getattr(args, "max_history", 20)
 
     while True:
         query = input(console.user_prompt())
@@ -42,17 +61,32 @@ def fastllm_chat(args):
             history = []
             console.success("对话历史已清空")
             continue
-        console.ai_response_start()
-        curResponse = "";
-        for response in model.stream_response(query, history = history, 
-                                              repeat_penalty = generation_config["repetition_penalty"],
-                                              top_p = generation_config["top_p"],
-                                              top_k = generation_config["top_k"],
-                                              temperature = generation_config["temperature"]):
-            curResponse += response;
-            print(response, flush = True, end = "")
+        console.ai_response_start_fast()
+        parts = []
+        # 按大小或时间间隔批量写出，避免每个 token 一次 write + flush
+        pending = []
+        pending_len = 0
+        last_flush = time.monotonic()
+        for response in model.stream_response(query, history = history, **gen_kwargs):
+            parts.append(response)
+            pending.append(response)
+            pending_len += len(response)
+            now = time.monotonic()
+            if pending_len >= _FLUSH_CHARS or now - last_flush >= _FLUSH_INTERVAL:
+                sys.stdout.write("".join(pending))
+                sys.stdout.flush()
+                pending.clear()
+                pending_len = 0
+                last_flush = now
+        if pending:
+            sys.stdout.write("".join(pending))
+        sys.stdout.flush()
+        curResponse = "".join(parts)
         print()  # 换行
         history.append((query, curResponse))
+        # 只保留最近 max_history 轮对话（'clear' 仍会清空全部记录）
+        if max_history > 0 and len(history) > max_history:
+            del history[:len(history) - max_history]
     
     console.info("正在释放资源...")
     model.release_memory()
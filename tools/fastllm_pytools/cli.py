@@ -1,6 +1,5 @@
 import argparse
 from .util import make_normal_parser
-import readline
 import os
 
 def save_defaults_to_json(parser, filename):
@@ -39,45 +38,67 @@ def save_defaults_to_json(parser, filename):
     
     print("Create config to -> \"" + filename + "\"")
 
-def args_parser():
+# args_parser 构建的全部子命令名
+_SUBCOMMANDS = frozenset(('ui', 'chat', 'run', 'download', 'webui', 'serve', 'server', 'config', 'export'))
+
+def args_parser(argv = None):
     parser = argparse.ArgumentParser(description = "fastllm")
     subparsers = parser.add_subparsers(dest='command', help='子命令')
 
-    # 创建共享的解析器
-    shared_parser = make_normal_parser("fastllm", add_help = False)
+    # 先嗅探子命令，只构建需要的子解析器；不是本解析器的子命令时（如 --help、bench、api）构建全部，
+    # 让 argparse 的报错列出完整的可选项
+    from .help_text import sniff_subcommand, find_command
+    token = sniff_subcommand(argv)
+    cmd = find_command(token) if token in _SUBCOMMANDS else None
+    wanted = None if cmd is None else {cmd.name, *cmd.aliases}
 
-    # 下载解析器
-    from ftllm.download import make_download_parser
-    download_parser = make_download_parser(add_help = False)
+    def need(name):
+        return wanted is None or name in wanted
+
+    # 创建共享的解析器
+    shared_parser = None
+    if wanted is None or wanted & {'ui', 'chat', 'run', 'webui', 'serve', 'server', 'export'}:
+        shared_parser = make_normal_parser("fastllm", add_help = False)
 
     # 打开ui界面
-    ui_parser_ = subparsers.add_parser('ui', parents = [shared_parser], help = 'ui模式')
+    if need('ui'):
+        ui_parser_ = subparsers.add_parser('ui', parents = [shared_parser], help = 'ui模式')
 
     # 创建chat子命令（使用共享解析器）
-    chat_parser_ = subparsers.add_parser('chat', parents = [shared_parser], help = '聊天模式')
+    if need('chat'):
+        chat_parser_ = subparsers.add_parser('chat', parents = [shared_parser], help = '聊天模式')
 
     # 创建run子命令（使用相同的共享解析器）
-    run_parser_ = subparsers.add_parser('run', parents = [shared_parser], help = '运行模式')
+    if need('run'):
+        run_parser_ = subparsers.add_parser('run', parents = [shared_parser], help = '运行模式')
 
-    download_parser_ = subparsers.add_parser('download', parents = [download_parser], help = '下载模型')
+    if need('download'):
+        # 下载解析器
+        from ftllm.download import make_download_parser
+        download_parser = make_download_parser(add_help = False)
+        download_parser_ = subparsers.add_parser('download', parents = [download_parser], help = '下载模型')
 
     # 创建webui子命令（独立的解析器）
-    webui_parser_ = subparsers.add_parser('webui', parents = [shared_parser], help='Web UI')
-    webui_parser_.add_argument('--port', type = int, default = 1616, help = '端口号')
-    webui_parser_.add_argument("--max_token", type = int, default = 4096, help = "输出最大token数")
-    webui_parser_.add_argument("--think", type = str, default = "false", help = "if <think> lost")
-
-    server_parser = shared_parser
-    from ftllm.util import add_server_args
-    add_server_args(server_parser)
-    server_parser_ = subparsers.add_parser('serve', parents = [server_parser], help = 'api模式')
-    serve_parser_ = subparsers.add_parser('server', parents = [server_parser], help = 'api模式')
-
-    config_parser_ = subparsers.add_parser('config', help = '创建配置文件')
-    config_parser_.add_argument('file', nargs='?', help = '配置文件的路径')
-
-    export_parser_ = subparsers.add_parser('export', parents = [shared_parser], help = '创建配置文件')
-    export_parser_.add_argument('-o', '--output', type = str, required = True, help = '导出路径')
+    if need('webui'):
+        webui_parser_ = subparsers.add_parser('webui', parents = [shared_parser], help='Web UI')
+        webui_parser_.add_argument('--port', type = int, default = 1616, help = '端口号')
+        webui_parser_.add_argument("--max_token", type = int, default = 4096, help = "输出最大token数")
+        webui_parser_.add_argument("--think", type = str, default = "false", help = "if <think> lost")
+
+    if need('serve') or need('server'):
+        server_parser = shared_parser
+        from ftllm.util import add_server_args
+        add_server_args(server_parser)
+        server_parser_ = subparsers.add_parser('serve', parents = [server_parser], help = 'api模式')
+        serve_parser_ = subparsers.add_parser('server', parents = [server_parser], help = 'api模式')
+
+    if need('config'):
+        config_parser_ = subparsers.add_parser('config', help = '创建配置文件')
+        config_parser_.add_argument('file', nargs='?', help = '配置文件的路径')
+
+    if need('export'):
+        export_parser_ = subparsers.add_parser('export', parents = [shared_parser], help = '创建配置文件')
+        export_parser_.add_argument('-o', '--output', type = str, required = True, help = '导出路径')
 
     parser.add_argument('-v', '--version', action='store_true', help='输出版本号并退出')
 
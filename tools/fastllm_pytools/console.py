@@ -7,7 +7,38 @@ console.py - 控制台美化输出模块
 
 import os
 import sys
-from contextlib import contextmanager
+import unicodedata
+from functools import lru_cache
+
+# Windows kernel32 句柄，首次使用时加载
+_kernel32 = None
+
+
+def _get_kernel32():
+    global _kernel32
+    if _kernel32 is None:
+        import ctypes
+        _kernel32 = ctypes.windll.kernel32
+    return _kernel32
+
+
+def _enable_vt_mode() -> bool:
+    """尝试为 Windows 控制台启用 VT 模式，成功返回 True"""
+    try:
+        import ctypes
+        kernel32 = _get_kernel32()
+        STD_OUTPUT_HANDLE = -11
+        ENABLE_VIRTUAL_TERMINAL_PROCESSING = 0x0004
+        handle = kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
+        mode = ctypes.c_ulong()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            if mode.value & ENABLE_VIRTUAL_TERMINAL_PROCESSING:
+                return True
+            return bool(kernel32.SetConsoleMode(handle, mode.value | ENABLE_VIRTUAL_TERMINAL_PROCESSING))
+    except Exception:
+        pass
+    return False
+
 
 # 检测 ANSI 支持
 _ansi_enabled = os.environ.get("FTLLM_ANSI", "0") == "1"
@@ -17,18 +48,10 @@ if not _ansi_enabled and sys.platform != "win32":
     # Unix 系统默认支持
     _ansi_enabled = True
 elif not _ansi_enabled and sys.platform == "win32":
-    # Windows: 检查是否在支持 ANSI 的终端中
+    # Windows: 仅在输出到终端时检测（管道/重定向时跳过控制台 API 调用）
     try:
-        import ctypes
-        kernel32 = ctypes.windll.kernel32
-        # 尝试启用 VT 模式
-        STD_OUTPUT_HANDLE = -11
-        ENABLE_VIRTUAL_TERMINAL_PROCESSING = 0x0004
-        handle = kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
-        mode = ctypes.c_ulong()
-        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
-            if kernel32.SetConsoleMode(handle, mode.value | ENABLE_VIRTUAL_TERMINAL_PROCESSING):
-                _ansi_enabled = True
+        if sys.stdout.isatty():
+            _ansi_enabled = _enable_vt_mode()
     except Exception:
         pass
 
@@ -77,54 +100,100 @@ class Icon:
     SPARKLE = "✨"
 
 
+# 常用样式的模块级绑定，省去 Style 类属性查找
+_RESET = Style.RESET
+_GREEN = Style.GREEN
+_RED = Style.RED
+_YELLOW = Style.YELLOW
+_CYAN = Style.CYAN
+_BOLD = Style.BOLD
+_DIM = Style.DIM
+
+
 def is_ansi_enabled() -> bool:
     """检查 ANSI 是否启用"""
     return _ansi_enabled
 
 
+@lru_cache(maxsize=64)
+def _style_codes(styles: tuple) -> str:
+    """拼接样式代码（按样式组合缓存）"""
+    return "".join(styles)
+
+
 def styled(text: str, *styles) -> str:
     """应用样式到文本"""
     if not _ansi_enabled or not styles:
         return text
-    style_codes = "".join(styles)
-    return f"{style_codes}{text}{Style.RESET}"
+    if len(styles) == 1:
+        return styles[0] + text + _RESET
+    return _style_codes(styles) + text + _RESET
+
+
+# 预先计算的输出前缀，随 _ansi_enabled 变化由 _build_prefixes() 刷新
+_CLEAR_LINE = ""
+_PFX_SUCCESS = ""
+_PFX_ERROR = ""
+_PFX_INFO = ""
+_PFX_WARN = ""
+_PFX_HEADER = ""
+_SFX_HEADER = ""
+_AI_START = ""
+_AI_START_BYTES = b""
+_USER_PROMPT = ""
+
+
+def _build_prefixes() -> None:
+    """根据当前 ANSI 状态生成各类消息前缀"""
+    global _CLEAR_LINE, _PFX_SUCCESS, _PFX_ERROR, _PFX_INFO, _PFX_WARN
+    global _PFX_HEADER, _SFX_HEADER, _AI_START, _AI_START_BYTES, _USER_PROMPT
+    if _ansi_enabled:
+        _CLEAR_LINE = "\x1b[2K\r"
+        _PFX_SUCCESS = f"{Style.GREEN}{Icon.CHECK}{Style.RESET} "
+        _PFX_ERROR = f"{Style.RED}{Icon.CROSS}{Style.RESET} "
+        _PFX_INFO = f"{Style.CYAN}{Icon.INFO}{Style.RESET} "
+        _PFX_WARN = f"{Style.YELLOW}{Icon.WARN}{Style.RESET} "
+        _PFX_HEADER = f"\n{Style.BOLD}{Style.CYAN}{Icon.PLAY} "
+        _SFX_HEADER = f"{Style.RESET}\n" + "─" * 40
+        _AI_START = f"{Style.BOLD}{Style.GREEN}AI:{Style.RESET} "
+        _USER_PROMPT = f"\n{Style.BOLD}{Style.BLUE}User：{Style.RESET}"
+    else:
+        _CLEAR_LINE = "\r" + " " * 60 + "\r"
+        _PFX_SUCCESS = "[OK] "
+        _PFX_ERROR = "[ERROR] "
+        _PFX_INFO = "[INFO] "
+        _PFX_WARN = "[WARN] "
+        _PFX_HEADER = "\n=== "
+        _SFX_HEADER = " ==="
+        _AI_START = "AI: "
+        _USER_PROMPT = "\nUser："
+    _AI_START_BYTES = _AI_START.encode("utf-8")
+
+
+_build_prefixes()
 
 
 def success(msg: str) -> None:
     """打印成功消息"""
     # 先清除当前行（可能有进度或状态信息）
-    if _ansi_enabled:
-        sys.stdout.write("\x1b[2K\r")
-        sys.stdout.flush()
-        print(f"{Style.GREEN}{Icon.CHECK}{Style.RESET} {msg}")
-    else:
-        sys.stdout.write("\r" + " " * 60 + "\r")
-        sys.stdout.flush()
-        print(f"[OK] {msg}")
+    sys.stdout.write(_CLEAR_LINE)
+    sys.stdout.flush()
+    print(_PFX_SUCCESS + msg)
 
 
 def error(msg: str) -> None:
     """打印错误消息"""
-    if _ansi_enabled:
-        print(f"{Style.RED}{Icon.CROSS}{Style.RESET} {msg}")
-    else:
-        print(f"[ERROR] {msg}")
+    print(_PFX_ERROR + msg)
 
 
 def info(msg: str) -> None:
     """打印信息消息"""
-    if _ansi_enabled:
-        print(f"{Style.CYAN}{Icon.INFO}{Style.RESET} {msg}")
-    else:
-        print(f"[INFO] {msg}")
+    print(_PFX_INFO + msg)
 
 
 def warning(msg: str) -> None:
     """打印警告消息"""
-    if _ansi_enabled:
-        print(f"{Style.YELLOW}{Icon.WARN}{Style.RESET} {msg}")
-    else:
-        print(f"[WARN] {msg}")
+    print(_PFX_WARN + msg)
 
 
 def config(key: str, value: str) -> None:
@@ -137,11 +206,7 @@ def config(key: str, value: str) -> None:
 
 def header(title: str) -> None:
     """打印章节标题"""
-    if _ansi_enabled:
-        print(f"\n{Style.BOLD}{Style.CYAN}{Icon.PLAY} {title}{Style.RESET}")
-        print("─" * 40)
-    else:
-        print(f"\n=== {title} ===")
+    print(_PFX_HEADER + title + _SFX_HEADER)
 
 
 def rule(char: str = "─", width: int = 40) -> None:
@@ -196,17 +261,26 @@ def prompt(text: str) -> str:
 
 def ai_response_start() -> None:
     """AI 响应开始标记"""
-    if _ansi_enabled:
-        print(f"{Style.BOLD}{Style.GREEN}AI:{Style.RESET} ", end="")
-    else:
-        print("AI: ", end="")
+    sys.stdout.write(_AI_START)
+
+
+def ai_response_start_fast() -> None:
+    """AI 响应开始标记，UTF-8 输出时直接写入底层字节缓冲区"""
+    out = sys.stdout
+    buffer = getattr(out, "buffer", None)
+    if buffer is None or (out.encoding or "").lower().replace("-", "") != "utf8":
+        out.write(_AI_START)
+        out.flush()
+        return
+    # 先刷出文本层中尚未写出的内容，保证输出顺序
+    out.flush()
+    buffer.write(_AI_START_BYTES)
+    buffer.flush()
 
 
 def user_prompt() -> str:
     """获取用户输入提示文本"""
-    if _ansi_enabled:
-        return f"\n{Style.BOLD}{Style.BLUE}User：{Style.RESET}"
-    return "\nUser："
+    return _USER_PROMPT
 
 
 def clear_line() -> None:
@@ -222,21 +296,18 @@ def init() -> None:
     global _ansi_enabled
     if sys.platform == "win32":
         try:
-            import ctypes
-            kernel32 = ctypes.windll.kernel32
-            # 设置控制台输出代码页为 UTF-8
-            kernel32.SetConsoleOutputCP(65001)
-            kernel32.SetConsoleCP(65001)
-            # 启用 VT 模式
-            STD_OUTPUT_HANDLE = -11
-            ENABLE_VIRTUAL_TERMINAL_PROCESSING = 0x0004
-            handle = kernel32.GetStdHandle(STD_OUTPUT_HANDLE)
-            mode = ctypes.c_ulong()
-            if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
-                kernel32.SetConsoleMode(handle, mode.value | ENABLE_VIRTUAL_TERMINAL_PROCESSING)
-                _ansi_enabled = True
+            kernel32 = _get_kernel32()
+            # 设置控制台代码页为 UTF-8（已设置时跳过）
+            if kernel32.GetConsoleOutputCP() != 65001:
+                kernel32.SetConsoleOutputCP(65001)
+            if kernel32.GetConsoleCP() != 65001:
+                kernel32.SetConsoleCP(65001)
         except Exception:
             pass
+        # 启用 VT 模式（导入时已启用则跳过）
+        if not _ansi_enabled and _enable_vt_mode():
+            _ansi_enabled = True
+            _build_prefixes()
     # 设置 stdout 编码
     if hasattr(sys.stdout, 'reconfigure'):
         try:
@@ -245,6 +316,12 @@ def init() -> None:
             pass
 
 
+@lru_cache(maxsize=1024)
+def _display_width(text: str) -> int:
+    """计算文本的终端显示宽度（全角/宽字符占 2 列）"""
+    return sum(2 if unicodedata.east_asian_width(c) in ('W', 'F') else 1 for c in text)
+
+
 def box_start(title: str, width: int = 50) -> None:
     """开始一个信息框"""
     if _ansi_enabled:
@@ -254,7 +331,7 @@ def box_start(title: str, width: int = 50) -> None:
         title_display = f" {title} "
         padding = width - 4 - len(title_display.encode('utf-8').decode('utf-8'))
         # 使用中文字符宽度计算
-        title_len = sum(2 if ord(c) > 127 else 1 for c in title_display)
+        title_len = _display_width(title_display)
         padding = width - 2 - title_len
         if padding < 0:
             padding = 0
@@ -280,7 +357,7 @@ def box_line(key: str, value: str, width: int = 50) -> None:
     if _ansi_enabled:
         content = f"  {key}: {Style.BRIGHT_CYAN}{value}{Style.RESET}"
         # 计算实际显示宽度（不含 ANSI 码）
-        visible_len = sum(2 if ord(c) > 127 else 1 for c in f"  {key}: {value}")
+        visible_len = _display_width(f"  {key}: ") + _display_width(value)
         padding = width - 2 - visible_len
         if padding < 0:
             padding = 0
@@ -294,11 +371,11 @@ def banner(title: str, subtitle: str = None) -> None:
     if _ansi_enabled:
         print(f"\n{Style.BOLD}{Style.CYAN}╔{'═' * 48}╗{Style.RESET}")
         # 居中标题
-        title_len = sum(2 if ord(c) > 127 else 1 for c in title)
+        title_len = _display_width(title)
         padding = (48 - title_len) // 2
         print(f"{Style.BOLD}{Style.CYAN}║{Style.RESET}{' ' * padding}{Style.BOLD}{title}{Style.RESET}{' ' * (48 - padding - title_len)}{Style.BOLD}{Style.CYAN}║{Style.RESET}")
         if subtitle:
-            sub_len = sum(2 if ord(c) > 127 else 1 for c in subtitle)
+            sub_len = _display_width(subtitle)
             sub_padding = (48 - sub_len) // 2
             print(f"{Style.BOLD}{Style.CYAN}║{Style.RESET}{Style.DIM}{' ' * sub_padding}{subtitle}{' ' * (48 - sub_padding - sub_len)}{Style.RESET}{Style.BOLD}{Style.CYAN}║{Style.RESET}")
         print(f"{Style.BOLD}{Style.CYAN}╚{'═' * 48}╝{Style.RESET}\n")
@@ -312,19 +389,19 @@ def banner(title: str, subtitle: str = None) -> None:
 
 # 便捷的颜色函数
 def green(text: str) -> str:
-    return styled(text, Style.GREEN)
+    return _GREEN + text + _RESET if _ansi_enabled else text
 
 def red(text: str) -> str:
-    return styled(text, Style.RED)
+    return _RED + text + _RESET if _ansi_enabled else text
 
 def yellow(text: str) -> str:
-    return styled(text, Style.YELLOW)
+    return _YELLOW + text + _RESET if _ansi_enabled else text
 
 def cyan(text: str) -> str:
-    return styled(text, Style.CYAN)
+    return _CYAN + text + _RESET if _ansi_enabled else text
 
 def bold(text: str) -> str:
-    return styled(text, Style.BOLD)
+    return _BOLD + text + _RESET if _ansi_enabled else text
 
 def dim(text: str) -> str:
-    return styled(text, Style.DIM)
+    return _DIM + text + _RESET if _ansi_enabled else text
@@ -4,9 +4,13 @@ help_text.py - 统一帮助文本定义
 与 C++ include/utils/help_text.h 保持同步
 """
 
+import sys
 from dataclasses import dataclass, field
-from typing import Optional, List
-import argparse
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import argparse
 
 # ============================================================================
 # 程序信息
@@ -19,7 +23,18 @@ PROGRAM_VERSION = "1.0"
 # ============================================================================
 # 数据结构定义
 # ============================================================================
-@dataclass
+# 定义表为只读常量：冻结实例，Python 3.10+ 同时使用 __slots__
+_DATACLASS_OPTS = {"frozen": True, "slots": True} if sys.version_info >= (3, 10) else {"frozen": True}
+
+# py_type -> add_argument 参数（类型/默认值/动作）
+_TYPE_HANDLERS = {
+    'int': lambda d: {'type': int, 'default': int(d)} if d else {'type': int},
+    'bool': lambda d: {'action': 'store_true'},
+    'str': lambda d: {'type': str, 'default': d} if d else {'type': str},
+}
+
+
+@dataclass(**_DATACLASS_OPTS)
 class ParamDef:
     """参数定义"""
     name: str           # 参数名 (如 "-p, --path <路径>")
@@ -28,15 +43,34 @@ class ParamDef:
     py_type: Optional[str] = None      # Python 类型
     default_val: Optional[str] = None  # 默认值
 
-
-@dataclass
+    def flags(self) -> List[str]:
+        """解析参数名，移除 <xxx> 部分，如 ["-p", "--path"]"""
+        flags = []
+        for part in self.name.split(','):
+            part = part.strip()
+            if '<' in part:
+                part = part[:part.index('<')].strip()
+            if part.startswith('-'):
+                flags.append(part)
+        return flags
+
+    def argparse_kwargs(self) -> Dict[str, Any]:
+        """构建 add_argument 参数"""
+        kwargs = {'help': self.desc}
+        handler = _TYPE_HANDLERS.get(self.py_type)
+        if handler is not None:
+            kwargs.update(handler(self.default_val))
+        return kwargs
+
+
+@dataclass(**_DATACLASS_OPTS)
 class ParamGroup:
     """参数组定义"""
     title: str
     params: List[ParamDef]
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTS)
 class CommandDef:
     """命令定义"""
     name: str
@@ -44,9 +78,14 @@ class CommandDef:
     exe: Optional[str]  # Native 后端的可执行文件名 (Python 为 None)
     desc: str
     is_native: bool     # True: C++ Native, False: Python
+    help_row: str = field(default="", init=False, repr=False, compare=False)  # 帮助文本中的一行
 
+    def __post_init__(self):
+        aliases = f" ({', '.join(self.aliases)})" if self.aliases else ""
+        object.__setattr__(self, "help_row", f"  {self.name:12}{aliases:20} {self.desc}")
 
-@dataclass
+
+@dataclass(**_DATACLASS_OPTS)
 class ExampleDef:
     """示例定义"""
     cmd: str
@@ -54,7 +93,7 @@ class ExampleDef:
     args: Optional[str] = None
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTS)
 class ModelFormatDef:
     """模型格式定义"""
     format: str
@@ -89,6 +128,7 @@ PARAM_GROUPS = [
         ParamDef("--dtype <类型>", "float16, int8, int4, int4g", "dtype", "str", "auto"),
         ParamDef("-t, --threads <数量>", "CPU 线程数", "threads", "int", "-1"),
         ParamDef("--model_name <名称>", "模型显示名称 (用于 API 返回)", "model_name", "str"),
+        ParamDef("--max_history <数量>", "对话保留的最大轮数 (run/chat)", "max_history", "int", "20"),
     ]),
     ParamGroup("服务器参数", [
         ParamDef("--host <地址>", "监听地址 (默认: 127.0.0.1)", "host", "str", "127.0.0.1"),
@@ -96,6 +136,8 @@ PARAM_GROUPS = [
         ParamDef("--api_key <密钥>", "API 密钥认证 (Bearer Token)", "api_key", "str"),
         ParamDef("--embedding_path <路径>", "Embedding 模型路径", "embedding_path", "str"),
         ParamDef("--dev_mode", "开发模式 (启用调试接口)", "dev_mode", "bool"),
+        ParamDef("--sse_flush_ms <毫秒>", "流式输出合并发送的最长等待 (0 为逐帧发送)", "sse_flush_ms", "int", "5"),
+        ParamDef("--enable_cors", "启用 CORS 跨域支持 (浏览器直连时需要, 开发模式下默认启用)", "enable_cors", "bool"),
     ]),
     ParamGroup("Batch / 并发参数", [
         ParamDef("--batch <数量>", "批处理大小", "max_batch", "int", "-1"),
@@ -163,6 +205,12 @@ MODEL_FORMATS = [
     ModelFormatDef("HuggingFace Repo ID", "如 Qwen/Qwen2.5-7B (自动下载, 需 -py)"),
 ]
 
+# 帮助文本中的静态段落，导入时生成
+_EXAMPLES_BLOCK = "\n".join(
+    f"  {PROGRAM_NAME} {ex.cmd} {ex.model}{(' ' + ex.args) if ex.args else ''}" for ex in EXAMPLES
+)
+_FORMATS_BLOCK = "\n".join(f"  {fmt.format:24} {fmt.desc}" for fmt in MODEL_FORMATS)
+
 
 # ============================================================================
 # 帮助文本生成工具
@@ -172,24 +220,40 @@ def get_commands_by_type(is_native: bool) -> List[CommandDef]:
     return [cmd for cmd in COMMANDS if cmd.is_native == is_native]
 
 
+# 名称/别名 -> 命令、标题 -> 参数组 的索引，导入时构建一次（逆序插入，重名时靠前的定义优先）
+_CMD_BY_NAME: Dict[str, CommandDef] = {
+    key: cmd for cmd in reversed(COMMANDS) for key in (cmd.name, *cmd.aliases)
+}
+_GROUP_BY_TITLE: Dict[str, ParamGroup] = {group.title: group for group in reversed(PARAM_GROUPS)}
+
+
+@lru_cache(maxsize=64)
 def find_command(name: str) -> Optional[CommandDef]:
     """根据名称或别名查找命令"""
-    name_lower = name.lower()
-    for cmd in COMMANDS:
-        if cmd.name == name_lower or name_lower in cmd.aliases:
-            return cmd
+    return _CMD_BY_NAME.get(name.lower())
+
+
+def sniff_subcommand(argv: Optional[List[str]] = None) -> Optional[str]:
+    """
+    在构建解析器之前从命令行中找出子命令（第一个不以 '-' 开头的参数，原样返回）
+
+    Args:
+        argv: 命令行参数，None 表示 sys.argv[1:]
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg
     return None
 
 
 def get_param_group(title: str) -> Optional[ParamGroup]:
     """根据标题获取参数组"""
-    for group in PARAM_GROUPS:
-        if group.title == title:
-            return group
-    return None
+    return _GROUP_BY_TITLE.get(title)
 
 
-def add_params_to_parser(parser: argparse.ArgumentParser, group_titles: Optional[List[str]] = None):
+def add_params_to_parser(parser: "argparse.ArgumentParser", group_titles: Optional[List[str]] = None):
     """
     将参数组添加到 argparse 解析器
     
@@ -197,92 +261,76 @@ def add_params_to_parser(parser: argparse.ArgumentParser, group_titles: Optional
         parser: argparse 解析器
         group_titles: 要添加的参数组标题列表，None 表示添加所有
     """
+    import argparse
+
+    added = set()
     for group in PARAM_GROUPS:
         if group_titles is not None and group.title not in group_titles:
             continue
-        
         for param in group.params:
             if param.py_name is None:
                 continue
-            
-            # 解析参数名
-            names = []
-            for part in param.name.split(','):
-                part = part.strip()
-                # 提取参数名，移除 <xxx> 部分
-                if '<' in part:
-                    part = part[:part.index('<')].strip()
-                if part.startswith('-'):
-                    names.append(part)
-            
-            if not names:
+            flags = param.flags()
+            if not flags or added.intersection(flags):
                 continue
-            
-            # 构建 add_argument 参数
-            kwargs = {'help': param.desc}
-            
-            if param.py_type == 'int':
-                kwargs['type'] = int
-                if param.default_val:
-                    kwargs['default'] = int(param.default_val)
-            elif param.py_type == 'bool':
-                kwargs['action'] = 'store_true'
-            elif param.py_type == 'str':
-                kwargs['type'] = str
-                if param.default_val:
-                    kwargs['default'] = param.default_val
-            
+            added.update(flags)
             try:
-                parser.add_argument(*names, **kwargs)
+                parser.add_argument(*flags, **param.argparse_kwargs())
             except argparse.ArgumentError:
                 # 参数已存在，跳过
                 pass
 
 
-def print_help(use_color: bool = True):
-    """打印统一帮助信息"""
-    from . import console
+@lru_cache(maxsize=2)
+def _build_help_text(pfx_header: str, sfx_header: str, pfx_info: str) -> str:
+    """
+    生成完整帮助文本（输入均为模块常量，按 console 前缀缓存）
+
+    Args:
+        pfx_header, sfx_header: console.header 使用的前后缀
+        pfx_info: console.info 使用的前缀
+    """
+    lines = []
     
     # 标题
-    console.header(f"{PROGRAM_NAME} - {PROGRAM_DESC}")
-    print()
+    lines.append(pfx_header + f"{PROGRAM_NAME} - {PROGRAM_DESC}" + sfx_header)
+    lines.append("")
     
     # 用法
-    print(f"用法: {PROGRAM_NAME} <命令> [模型路径] [选项...]")
-    print()
+    lines.append(f"用法: {PROGRAM_NAME} <命令> [模型路径] [选项...]")
+    lines.append("")
     
-    # Native 命令
-    console.info("C++ 原生命令:")
-    for cmd in get_commands_by_type(True):
-        aliases = f" ({', '.join(cmd.aliases)})" if cmd.aliases else ""
-        print(f"  {cmd.name:12}{aliases:20} {cmd.desc}")
-    print()
-    
-    # Python 命令
-    console.info("Python 命令:")
-    for cmd in get_commands_by_type(False):
-        aliases = f" ({', '.join(cmd.aliases)})" if cmd.aliases else ""
-        print(f"  {cmd.name:12}{aliases:20} {cmd.desc}")
-    print()
+    # Native / Python 命令
+    for title, is_native in (("C++ 原生命令:", True), ("Python 命令:", False)):
+        lines.append(pfx_info + title)
+        lines.extend(cmd.help_row for cmd in get_commands_by_type(is_native))
+        lines.append("")
     
     # 参数组
     for group in PARAM_GROUPS:
-        console.info(group.title + ":")
+        lines.append(pfx_info + group.title + ":")
         for param in group.params:
-            print(f"  {param.name:28} {param.desc}")
-        print()
+            lines.append(f"  {param.name:28} {param.desc}")
+        lines.append("")
     
     # 示例
-    console.info("示例:")
-    for ex in EXAMPLES:
-        args = f" {ex.args}" if ex.args else ""
-        print(f"  {PROGRAM_NAME} {ex.cmd} {ex.model}{args}")
-    print()
+    lines.append(pfx_info + "示例:")
+    lines.append(_EXAMPLES_BLOCK)
+    lines.append("")
     
     # 模型格式
-    console.info("支持的模型格式:")
-    for fmt in MODEL_FORMATS:
-        print(f"  {fmt.format:24} {fmt.desc}")
+    lines.append(pfx_info + "支持的模型格式:")
+    lines.append(_FORMATS_BLOCK)
+    lines.append("")
+    return "\n".join(lines)
+
+
+def print_help(use_color: bool = True):
+    """打印统一帮助信息"""
+    from . import console
+    
+    sys.stdout.write(_build_help_text(console._PFX_HEADER, console._SFX_HEADER, console._PFX_INFO))
+    sys.stdout.flush()
 
 
 # 测试
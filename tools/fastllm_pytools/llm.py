@@ -2,6 +2,7 @@ import ctypes
 import math
 import os
 import threading
+import time
 import asyncio
 import copy
 import json
@@ -156,6 +157,14 @@ fastllm_lib.embedding_sentence.restype = ctypes.POINTER(ctypes.c_float)
 fastllm_lib.embedding_tokens.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.c_bool, ctypes.POINTER(ctypes.c_int)]
 fastllm_lib.embedding_tokens.restype = ctypes.POINTER(ctypes.c_float)
 
+# 批量 embedding 接口，旧版本的库中没有时退回逐句调用
+_has_embedding_batch = hasattr(fastllm_lib, "embedding_tokens_batch") and hasattr(fastllm_lib, "free_float_array")
+if _has_embedding_batch:
+    fastllm_lib.embedding_tokens_batch.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int), ctypes.c_bool, ctypes.POINTER(ctypes.c_int)]
+    fastllm_lib.embedding_tokens_batch.restype = ctypes.POINTER(ctypes.c_float)
+    fastllm_lib.free_float_array.argtypes = [ctypes.POINTER(ctypes.c_float)]
+    fastllm_lib.free_float_array.restype = None
+
 fastllm_lib.reranker_compute_score.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
 fastllm_lib.reranker_compute_score.restype = ctypes.POINTER(ctypes.c_float)
 
@@ -222,14 +231,28 @@ LOG_CALLBACK_TYPE = ctypes.CFUNCTYPE(None, ctypes.POINTER(LogData))
 _current_log_callback = None
 _current_c_callback = None
 
-def _create_log_callback_wrapper(py_callback):
-    """将Python回调包装为C回调"""
+def _create_log_callback_wrapper(py_callback, min_interval_ms = 0, coalesce_events = ()):
+    """将Python回调包装为C回调
+
+    coalesce_events 中的事件在 min_interval_ms 内只转发一次（进度完成时总是转发），
+    被合并的事件不会构建字典，也不会进入 Python 回调。
+    """
+    min_interval = min_interval_ms / 1000.0
+    coalesce = frozenset(coalesce_events) if min_interval > 0 else frozenset()
+    last_emit = {}
     def c_callback(log_data_ptr):
         if py_callback is not None and log_data_ptr:
             data = log_data_ptr.contents
+            event = data.event
+            if event in coalesce and data.current < data.total:
+                now = time.monotonic()
+                last = last_emit.get(event)
+                if last is not None and now - last < min_interval:
+                    return
+                last_emit[event] = now
             # 将C数据转换为Python友好的字典
             py_data = {
-                'event': data.event,
+                'event': event,
                 'level': data.level,
                 'tag': data.tag.decode('utf-8') if data.tag else '',
                 'message': data.message.decode('utf-8') if data.message else '',
@@ -253,11 +276,13 @@ def _create_log_callback_wrapper(py_callback):
             py_callback(py_data)
     return LOG_CALLBACK_TYPE(c_callback)
 
-def set_log_callback(callback):
+def set_log_callback(callback, min_interval_ms = 0, coalesce_events = (LogEvent.PrefillProgress,)):
     """
     设置日志回调函数
     
     Args:
+        min_interval_ms: 大于 0 时，coalesce_events 中的事件在该间隔内只回调一次
+        coalesce_events: 需要合并的高频事件，默认只合并预填充进度
         callback: Python回调函数，接收一个字典参数，包含以下字段：
             - event: int, LogEvent枚举值
             - level: int, LogLevel枚举值  
@@ -282,7 +307,7 @@ def set_log_callback(callback):
     
     if callback is not None:
         _current_log_callback = callback
-        _current_c_callback = _create_log_callback_wrapper(callback)
+        _current_c_callback = _create_log_callback_wrapper(callback, min_interval_ms, coalesce_events)
         fastllm_lib.set_log_callback(_current_c_callback)
     else:
         _current_log_callback = None
@@ -298,8 +323,25 @@ class LogHandlers:
     """预定义的日志处理器集合"""
     
     # 用于节流日志更新的状态
-    _last_prefill_percent = -1
     _last_load_percent = -1
+    # 进度条宽度及预先生成的已完成/未完成部分，按需切片
+    _BAR_WIDTH = 30
+    _BAR_DONE = '#' * _BAR_WIDTH
+    _BAR_TODO = '-' * _BAR_WIDTH
+    # 加载进度行模板，按 ANSI 状态缓存，只需填入进度条和百分比
+    _load_line_templates = {}
+    
+    @staticmethod
+    def _load_line_template(ansi_enabled):
+        template = LogHandlers._load_line_templates.get(ansi_enabled)
+        if template is None:
+            from .console import Style
+            if ansi_enabled:
+                template = f"\x1b[?25l\x1b[2K\r{Style.DIM}加载权重 {Style.RESET}[{Style.GREEN}%s{Style.RESET}{Style.DIM}%s{Style.RESET}] %d%%"
+            else:
+                template = "\r加载权重 [%s%s] %d%%"
+            LogHandlers._load_line_templates[ansi_enabled] = template
+        return template
     
     @staticmethod
     def pretty_handler(data):
@@ -347,30 +389,26 @@ class LogHandlers:
                 console.warning(message)
         
         elif event == LogEvent.PrefillProgress:
-            # Prefill 进度（节流：只在百分比变化时更新）
+            # Prefill 进度（刷新频率由 set_log_callback 的 min_interval_ms 控制）
             current, total = data['current'], data['total']
             speed = data['speed']
             if total > 0:
                 percent = int(current * 100 / total)
-                # 首次一定显示，之后按百分比变化更新
-                if LogHandlers._last_prefill_percent == -1 or percent != LogHandlers._last_prefill_percent:
-                    LogHandlers._last_prefill_percent = percent
-                    progress = current / total
-                    bar_width = 30
-                    filled = int(bar_width * progress)
-                    bar = '#' * filled + '-' * (bar_width - filled)
-                    # 与 C++ 端保持一致：隐藏光标 -> 清除整行 -> 回到行首 -> 写内容
-                    if _ansi_enabled:
-                        sys.stdout.write(f"\x1b[?25l\x1b[2K\r{Style.CYAN}预填充中 {Style.RESET}[{Style.GREEN}{bar[:filled]}{Style.RESET}{Style.DIM}{bar[filled:]}{Style.RESET}] {percent}% {current}/{total} ({speed:.1f} tok/s)")
-                    else:
-                        # 非 ANSI：用空格覆盖旧内容
-                        line = f"\r预填充中 [{bar}] {percent}% {current}/{total} ({speed:.1f} tok/s)"
-                        sys.stdout.write(line.ljust(80))
-                    sys.stdout.flush()
+                progress = current / total
+                filled = int(LogHandlers._BAR_WIDTH * progress)
+                done = LogHandlers._BAR_DONE[:filled]
+                todo = LogHandlers._BAR_TODO[filled:]
+                # 与 C++ 端保持一致：隐藏光标 -> 清除整行 -> 回到行首 -> 写内容
+                if _ansi_enabled:
+                    sys.stdout.write(f"\x1b[?25l\x1b[2K\r{Style.CYAN}预填充中 {Style.RESET}[{Style.GREEN}{done}{Style.RESET}{Style.DIM}{todo}{Style.RESET}] {percent}% {current}/{total} ({speed:.1f} tok/s)")
+                else:
+                    # 非 ANSI：用空格覆盖旧内容
+                    line = f"\r预填充中 [{done}{todo}] {percent}% {current}/{total} ({speed:.1f} tok/s)"
+                    sys.stdout.write(line.ljust(80))
+                sys.stdout.flush()
         
         elif event == LogEvent.PrefillComplete:
-            # Prefill 完成，显示光标，重置状态（与 C++ 端一致）
-            LogHandlers._last_prefill_percent = -1
+            # Prefill 完成，显示光标（与 C++ 端一致）
             total = data.get('total', 0)
             speed = data.get('speed', 0)
             elapsed = data.get('elapsed', 0)
@@ -422,13 +460,9 @@ class LogHandlers:
                 if percent != LogHandlers._last_load_percent:
                     LogHandlers._last_load_percent = percent
                     progress = current / total
-                    bar_width = 30
-                    filled = int(progress * bar_width)
-                    bar = '#' * filled + '-' * (bar_width - filled)
-                    if _ansi_enabled:
-                        sys.stdout.write(f"\x1b[?25l\x1b[2K\r{Style.DIM}加载权重 {Style.RESET}[{Style.GREEN}{bar[:filled]}{Style.RESET}{Style.DIM}{bar[filled:]}{Style.RESET}] {percent}%")
-                    else:
-                        sys.stdout.write(f"\r加载权重 [{bar}] {percent}%")
+                    filled = int(progress * LogHandlers._BAR_WIDTH)
+                    template = LogHandlers._load_line_template(_ansi_enabled)
+                    sys.stdout.write(template % (LogHandlers._BAR_DONE[:filled], LogHandlers._BAR_TODO[filled:], percent))
                     sys.stdout.flush()
                 # 加载完成时重置状态
                 if current >= total:
@@ -472,13 +506,13 @@ class LogHandlers:
         """静默处理器，不输出任何内容"""
         pass
 
-def enable_pretty_logging():
+def enable_pretty_logging(min_interval_ms = 50):
     """启用美化日志输出"""
-    set_log_callback(LogHandlers.pretty_handler)
+    set_log_callback(LogHandlers.pretty_handler, min_interval_ms = min_interval_ms)
 
-def enable_simple_logging():
+def enable_simple_logging(min_interval_ms = 50):
     """启用简单日志输出"""
-    set_log_callback(LogHandlers.simple_handler)
+    set_log_callback(LogHandlers.simple_handler, min_interval_ms = min_interval_ms)
 
 def disable_logging():
     """禁用日志输出"""
@@ -492,7 +526,7 @@ try:
     fastllm_lib.clear_log_callback.restype = None
 except:
     # 如果库不支持日志回调，提供空实现
-    def set_log_callback(callback):
+    def set_log_callback(callback, min_interval_ms = 0, coalesce_events = ()):
         pass
     def clear_log_callback():
         pass
@@ -1091,6 +1125,14 @@ class model:
                 print("path error: ", path);
                 exit(0)
 
+        # 视觉模型会把输入图像缩放到的边长（CogVLM: vision_config.image_size），
+        # 服务端解码图像时据此让 JPEG 解码器直接缩小解码
+        self.vision_max_side = None
+        try:
+            self.vision_max_side = int(self.config["vision_config"]["image_size"])
+        except:
+            pass
+
         self.direct_query = False;
         self.system_prompt = system_prompt;
         self.eos_token = [] + eos_token
@@ -1513,7 +1555,9 @@ class model:
                         max_length: int = 8192, min_length: int = 0, do_sample = True, 
                         top_p = 0.8, top_k = 1, temperature = 1.0, repeat_penalty = 1.0,
                         one_by_one = True, stop_token_ids: List[int] = None, add_generation_prompt = True, 
-                        images: List = None, tools: List = None):
+                        images: List = None, tools: List = None, return_input_len = False):
+        # return_input_len=True 时返回 (handle, 输入 token 数)，免去调用方再分词一次统计长度；
+        # 由 C++ 端分词时无法得知长度，返回 (handle, None)
         conversation = None
         if (isinstance(query, List)):
             conversation = query
@@ -1567,7 +1611,7 @@ class model:
                                                         des.encode(), (ctypes.c_float * len(image))(*image),
                                                         max_length, min_length, do_sample, top_p, top_k, temperature, repeat_penalty,
                                                         False, stop_token_len, stop_token_list)
-            return handle
+            return (handle, len(input)) if return_input_len else handle
 
         if (self.hf_tokenizer != None and hasattr(self.hf_tokenizer, "chat_template") and self.hf_tokenizer.chat_template != ""):
             tokenizer = self.hf_tokenizer
@@ -1600,7 +1644,7 @@ class model:
                                                         False, stop_token_len, stop_token_list)
             if (self.save_history):
                 self.current_tokenizer_cache[handle] = [[prompt], [input]]
-            return handle
+            return (handle, len(input)) if return_input_len else handle
         else:
             prompt = ""
             if (conversation != None and len(conversation) != 0):
@@ -1612,7 +1656,7 @@ class model:
                                                             ctypes.c_int(max_length), ctypes.c_int(min_length), ctypes.c_bool(do_sample), ctypes.c_float(top_p), ctypes.c_int(top_k),
                                                             ctypes.c_float(temperature), ctypes.c_float(repeat_penalty), ctypes.c_bool(False),
                                                             stop_token_len, stop_token_list)
-            return handle
+            return (handle, None) if return_input_len else handle
     
     def abort_handle(self, handle):
         # print("into force abort")
@@ -1903,8 +1947,24 @@ class model:
         for i in range(embedding_len.value):
             embedding.append(embedding_c_float[i])
             #print("{:.7f}".format(embedding[i]), end=" ")
+        if _has_embedding_batch:
+            fastllm_lib.free_float_array(embedding_c_float)
         return embedding
     
+    def embedding_sentences_batch(self, inputs: List[str], normalize = True) -> List[List[float]]:
+        if (self.hf_tokenizer == None or not _has_embedding_batch):
+            return [self.embedding_sentence(input, normalize) for input in inputs]
+        input_ids = self.hf_tokenizer(inputs, truncation = True)['input_ids']
+        seq_lens = [len(ids) for ids in input_ids]
+        tokens = [token for ids in input_ids for token in ids]
+        embedding_len = ctypes.c_int(0)
+        ret_c = fastllm_lib.embedding_tokens_batch(self.model, len(inputs), (ctypes.c_int * len(seq_lens))(*seq_lens),
+                                                   (ctypes.c_int * len(tokens))(*tokens), normalize, embedding_len)
+        dim = embedding_len.value
+        ret = [ret_c[i * dim : (i + 1) * dim] for i in range(len(inputs))]
+        fastllm_lib.free_float_array(ret_c)
+        return ret
+
     def reranker_compute_score(self, pairs: List):
         batch = len(pairs)
         seq_lens = []
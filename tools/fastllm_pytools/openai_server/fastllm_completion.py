@@ -1,20 +1,147 @@
 import asyncio
+import atexit
+import hashlib
+import io
 import logging
 import json
-import traceback
+import queue
+import threading
 import time
 import shortuuid
 from fastapi import Request
+from pydantic import TypeAdapter
 from http import HTTPStatus
-from typing import (AsyncGenerator, AsyncIterator, Awaitable, Dict, Iterable, List,
+from collections import OrderedDict
+from typing import (AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Iterable, List,
                     Optional, Tuple, TypedDict, Union, Any, final)
-import uuid
 from openai.types.chat import (ChatCompletionContentPartParam,
                                ChatCompletionRole)
 
 from .protocal.openai_protocol import *
 from .. import console
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 图像解码依赖 PIL（可选，仅多模态请求需要）
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 图像 base64 解码：优先使用 SIMD 加速的 pybase64，接口与标准库一致
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+else:
+    def _json_dumps(obj: Any) -> bytes:
+        """紧凑 JSON 序列化（与 pydantic model_dump_json 输出格式一致）"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# 远程图像下载使用的共享 HTTP 客户端（带连接池），首次使用时创建
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client():
+    """获取共享 HTTP 客户端：优先 httpx.Client，其次 requests.Session（均不可用时抛出 ImportError）"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                try:
+                    import httpx
+                    _http_client = httpx.Client(
+                        timeout=30,
+                        follow_redirects=True,
+                        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+                    )
+                except ImportError:
+                    import requests
+                    _http_client = requests.Session()
+    return _http_client
+
+
+# 消息内容中直接跳过的部分类型
+_TOOL_PART_TYPES = frozenset(('tool_use', 'tool_result', 'tool_calls', 'function'))
+_UNSUPPORTED_MEDIA_PART_TYPES = frozenset(('audio', 'audio_url', 'video', 'video_url', 'input_audio'))
+
+# 请求相关的控制台输出（开始提示、完成提示 + 统计信息）统一交给一个后台线程按提交顺序写出，
+# 避免 stdout 阻塞（慢终端、重定向管道）拖慢事件循环，也避免多线程输出交错
+_console_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_console_thread = None
+_console_thread_lock = threading.Lock()
+
+
+def _console_worker():
+    while True:
+        item = _console_queue.get()
+        if item is None:
+            return
+        func, args = item
+        try:
+            func(*args)
+        except Exception:
+            logging.exception("Error writing request info to console")
+
+
+def _drain_console() -> None:
+    """进程退出时写完队列中剩余的输出"""
+    _console_queue.put_nowait(None)
+    _console_thread.join(timeout=5)
+
+
+def _submit_console(func: Callable, *args: Any) -> None:
+    """提交一条控制台输出，由后台线程按提交顺序执行"""
+    global _console_thread
+    if _console_thread is None:
+        with _console_thread_lock:
+            if _console_thread is None:
+                _console_thread = threading.Thread(target=_console_worker, name="ftllm-console", daemon=True)
+                _console_thread.start()
+                atexit.register(_drain_console)
+    _console_queue.put_nowait((func, args))
+
+
+def _print_request_report(request_id: str, stats: Any) -> None:
+    console.request_complete(request_id)
+    if stats:
+        console.print_inference_stats(
+            stats.prompt_tokens, stats.output_tokens,
+            stats.total_time, stats.first_token_time, stats.speed
+        )
+    else:
+        logging.debug(f"无法获取请求 {request_id} 的统计信息")
+
+
+def _submit_console_report(request_id: str, stats: Any) -> None:
+    """提交一条请求完成记录"""
+    _submit_console(_print_request_report, request_id, stats)
+
+
+# SSE 帧模板（bytes % 一次生成整帧，避免多次拼接）
+_SSE_FRAME = b"data: %b\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+# 流式输出合并：缓冲的帧超过该字节数或距上次发送超过该时间（秒）时发送
+_SSE_FLUSH_BYTES = 16 * 1024
+_SSE_FLUSH_INTERVAL = 0.005
+# 一次性序列化整个 tools 列表（在 pydantic-core 内完成遍历，避免逐个 model_dump）
+_TOOLS_ADAPTER = TypeAdapter(List[ChatCompletionToolsParam])
+
+# dict.pop 的缺省哨兵，用于区分“不存在”和值为 None
+_MISSING = object()
+
+# 每生成多少个 token 检查一次客户端是否断开（is_disconnected 需要轮询接收通道，开销不小）
+_DISCONNECT_CHECK_INTERVAL = 16
+
 
 class ConversationMessage:
     """
@@ -28,6 +155,11 @@ class ConversationMessage:
     - reasoning: 推理内容（用于 thinking 模式）
     - images: 图像列表（用于多模态模型）
     """
+    __slots__ = ("role", "content", "tool_calls", "tool_call_id", "name", "reasoning", "images")
+
+    # to_dict 输出的可选字段（值为 None 时省略）；images 不放入字典，需要单独处理
+    _DICT_FIELDS = ("content", "tool_calls", "tool_call_id", "name", "reasoning")
+
     def __init__(
         self, 
         role: str, 
@@ -49,28 +181,17 @@ class ConversationMessage:
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式，用于传递给模型"""
         result: Dict[str, Any] = {"role": self.role}
-        if self.content is not None:
-            result["content"] = self.content
-        if self.tool_calls is not None:
-            result["tool_calls"] = self.tool_calls
-        if self.tool_call_id is not None:
-            result["tool_call_id"] = self.tool_call_id
-        if self.name is not None:
-            result["name"] = self.name
-        if self.reasoning is not None:
-            result["reasoning"] = self.reasoning
-        # images 不放入字典，需要单独处理
+        for key in self._DICT_FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                result[key] = value
         return result
 
 
-def random_uuid() -> str:
-    return str(uuid.uuid4().hex)
-
-
 class ChatCompletionStreamResponseWithUsage(BaseModel):
-    id: str = Field(default_factory=lambda: f"chatcmpl-{shortuuid.random()}")
+    id: str = Field(default_factory=lambda: f"chatcmpl-{random_short_id()}")
     object: str = "chat.completion.chunk"
-    created: int = Field(default_factory=lambda: int(time.time()))
+    created: int
     model: str
     choices: List[ChatCompletionResponseStreamChoice]
     usage: Optional[UsageInfo] = Field(default=None)
@@ -78,7 +199,7 @@ class ChatCompletionStreamResponseWithUsage(BaseModel):
 
 
 class FastLLmCompletion:
-    def __init__(self, model_name, model, think, show_input):
+    def __init__(self, model_name, model, think, show_input, sse_flush_ms=None):
         self.model_name = model_name
         self.model = model
         self.init_fast_llm_model()
@@ -89,8 +210,28 @@ class FastLLmCompletion:
         self.tool_parser = None
         # 生成系统指纹（用于标识当前模型配置）
         self._system_fingerprint = f"fp_{shortuuid.random()[:12]}"
+        # 流式输出合并的最长等待时间（秒），0 表示每帧立即发送
+        self._sse_flush_interval = _SSE_FLUSH_INTERVAL if sse_flush_ms is None else max(0.0, sse_flush_ms) / 1000
         # 累计请求计数器
         self._total_request_count = 0
+        # 已解码图像的 LRU 缓存（按图像数据哈希），多轮对话中重复出现的图像不再重复解码
+        self._image_cache: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._image_cache_bytes = 0
+        self._image_cache_lock = threading.Lock()
+        # 流式首帧 (role=assistant) 模板，运行时只需填入 id 和 created
+        self._role_chunk_template = (
+            b'data: {"id":%s,"object":"chat.completion.chunk","created":%d,"model":'
+            + _json_dumps(model_name).replace(b"%", b"%%")
+            + b',"choices":[{"index":0,"delta":{"role":"assistant"}}]}\n\n'
+        )
+        # 纯文本增量帧模板，运行时填入 id、created 和已转义的 content
+        self._content_chunk_template = (
+            b'data: {"id":%s,"object":"chat.completion.chunk","created":%d,"model":'
+            + _json_dumps(model_name).replace(b"%", b"%%")
+            + b',"choices":[{"index":0,"delta":{"content":%s}}],"system_fingerprint":'
+            + _json_dumps(self._system_fingerprint).replace(b"%", b"%%")
+            + b'}\n\n'
+        )
 
     @property
     def system_fingerprint(self) -> str:
@@ -100,6 +241,37 @@ class FastLLmCompletion:
     def init_fast_llm_model(self):
         pass
 
+    def _chat_stream_chunk(
+        self,
+        request_id: str,
+        created_time: int,
+        delta: Dict[str, Any],
+        finish_reason: Optional[str] = None,
+        usage: Optional[Dict[str, int]] = None,
+        with_fingerprint: bool = True,
+    ) -> bytes:
+        """
+        直接以 dict 构造一帧 chat.completion.chunk SSE 数据
+
+        字段顺序及省略规则与 ChatCompletionStreamResponseWithUsage
+        .model_dump_json(exclude_unset=True, exclude_none=True) 保持一致
+        """
+        choice: Dict[str, Any] = {"index": 0, "delta": delta}
+        if finish_reason is not None:
+            choice["finish_reason"] = finish_reason
+        chunk: Dict[str, Any] = {
+            "id": request_id,
+            "object": "chat.completion.chunk",
+            "created": created_time,
+            "model": self.model_name,
+            "choices": [choice],
+        }
+        if usage is not None:
+            chunk["usage"] = usage
+        if with_fingerprint:
+            chunk["system_fingerprint"] = self._system_fingerprint
+        return _SSE_FRAME % _json_dumps(chunk)
+
     def create_error_response(
         self,
         message: str,
@@ -125,53 +297,30 @@ class FastLLmCompletion:
             param=param
         )
     
+    # 数值参数的取值范围：(参数名, 下限, 上限)
+    _RANGE_CHECKS = (
+        ("temperature", 0, 2),
+        ("top_p", 0, 1),
+        ("top_logprobs", 0, 20),
+        ("presence_penalty", -2, 2),
+        ("frequency_penalty", -2, 2),
+    )
+
     def _validate_request_params(self, request: ChatCompletionRequest) -> Optional[ErrorResponse]:
         """验证请求参数的有效性"""
-        # 验证 temperature
-        if request.temperature is not None:
-            if request.temperature < 0 or request.temperature > 2:
-                return self.create_error_response(
-                    message="temperature must be between 0 and 2",
-                    param="temperature"
-                )
-        
-        # 验证 top_p
-        if request.top_p is not None:
-            if request.top_p < 0 or request.top_p > 1:
-                return self.create_error_response(
-                    message="top_p must be between 0 and 1",
-                    param="top_p"
-                )
-        
-        # 验证 top_logprobs
-        if request.top_logprobs is not None:
-            if request.top_logprobs < 0 or request.top_logprobs > 20:
-                return self.create_error_response(
-                    message="top_logprobs must be between 0 and 20",
-                    param="top_logprobs"
-                )
-        
         # 验证 n (当前不支持 n > 1)
         if request.n is not None and request.n > 1:
             return self.create_error_response(
                 message="n > 1 is not supported yet",
                 param="n"
             )
-        
-        # 验证 presence_penalty
-        if request.presence_penalty is not None:
-            if request.presence_penalty < -2 or request.presence_penalty > 2:
-                return self.create_error_response(
-                    message="presence_penalty must be between -2 and 2",
-                    param="presence_penalty"
-                )
-        
-        # 验证 frequency_penalty
-        if request.frequency_penalty is not None:
-            if request.frequency_penalty < -2 or request.frequency_penalty > 2:
+
+        for name, lo, hi in self._RANGE_CHECKS:
+            value = getattr(request, name, None)
+            if value is not None and (value < lo or value > hi):
                 return self.create_error_response(
-                    message="frequency_penalty must be between -2 and 2",
-                    param="frequency_penalty"
+                    message=f"{name} must be between {lo} and {hi}",
+                    param=name
                 )
         
         return None
@@ -186,6 +335,39 @@ class FastLLmCompletion:
         else:
             return None
 
+    # 图像缓存容量上限（按解码后 RGB 像素数据的字节数计）
+    _IMAGE_CACHE_MAX_BYTES = 256 << 20
+
+    def _decode_image(self, image_bytes: bytes) -> Any:
+        """
+        将图像数据解码为 RGB 的 PIL.Image，按 BLAKE2b 哈希缓存解码结果
+
+        返回缓存图像的副本，避免调用方修改影响缓存
+        """
+        key = hashlib.blake2b(image_bytes, digest_size=16).digest()
+        with self._image_cache_lock:
+            image = self._image_cache.get(key)
+            if image is not None:
+                self._image_cache.move_to_end(key)
+        if image is None:
+            image = Image.open(io.BytesIO(image_bytes))
+            # 模型给出视觉输入最大边长时，让 JPEG 解码器直接按 1/2、1/4、1/8 缩小解码（不会小于该尺寸）
+            max_side = getattr(self.model, "vision_max_side", None)
+            if max_side:
+                image.draft('RGB', (max_side, max_side))
+            image = image.convert('RGB')
+            size = image.width * image.height * 3
+            # 超过整个缓存容量的图像不缓存
+            if size <= self._IMAGE_CACHE_MAX_BYTES:
+                with self._image_cache_lock:
+                    if key not in self._image_cache:
+                        self._image_cache[key] = image
+                        self._image_cache_bytes += size
+                        while self._image_cache_bytes > self._IMAGE_CACHE_MAX_BYTES:
+                            _, evicted = self._image_cache.popitem(last=False)
+                            self._image_cache_bytes -= evicted.width * evicted.height * 3
+        return image.copy()
+
     def _parse_image_content(self, image_data: Dict[str, Any]) -> Optional[Any]:
         """
         解析图像内容，支持 base64 和 URL 格式。
@@ -197,11 +379,11 @@ class FastLLmCompletion:
         
         返回 PIL.Image 对象或 None（解析失败时）
         """
+        if Image is None:
+            logging.warning("PIL not available for image processing")
+            return None
+
         try:
-            from PIL import Image
-            import io
-            import base64
-            
             part_type = image_data.get('type', '')
             
             if part_type == 'image_url':
@@ -220,8 +402,8 @@ class FastLLmCompletion:
                     # 格式: data:image/jpeg;base64,/9j/4AAQ...
                     try:
                         header, encoded = url.split(',', 1)
-                        image_bytes = base64.b64decode(encoded)
-                        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+                        image_bytes = _b64.b64decode(encoded, validate=False)
+                        image = self._decode_image(image_bytes)
                         logging.debug(f"Parsed base64 image: {image.size}")
                         return image
                     except Exception as e:
@@ -231,14 +413,13 @@ class FastLLmCompletion:
                 # 处理 URL 图像
                 elif url.startswith('http://') or url.startswith('https://'):
                     try:
-                        import requests
-                        response = requests.get(url, timeout=30)
+                        response = _get_http_client().get(url, timeout=30)
                         response.raise_for_status()
-                        image = Image.open(io.BytesIO(response.content)).convert('RGB')
+                        image = self._decode_image(response.content)
                         logging.debug(f"Downloaded image from URL: {image.size}")
                         return image
                     except ImportError:
-                        logging.warning("requests library not available for URL image download")
+                        logging.warning("httpx / requests library not available for URL image download")
                         return None
                     except Exception as e:
                         logging.warning(f"Failed to download image from URL: {e}")
@@ -252,8 +433,8 @@ class FastLLmCompletion:
                 encoded = image_data.get('image', '')
                 if encoded:
                     try:
-                        image_bytes = base64.b64decode(encoded)
-                        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+                        image_bytes = _b64.b64decode(encoded, validate=False)
+                        image = self._decode_image(image_bytes)
                         logging.debug(f"Parsed direct base64 image: {image.size}")
                         return image
                     except Exception as e:
@@ -262,9 +443,6 @@ class FastLLmCompletion:
             
             return None
             
-        except ImportError as e:
-            logging.warning(f"PIL not available for image processing: {e}")
-            return None
         except Exception as e:
             logging.warning(f"Error parsing image content: {e}")
             return None
@@ -274,20 +452,43 @@ class FastLLmCompletion:
         从消息内容中提取文本部分并扁平化为单个字符串。
         参考 vLLM 的 flatten_chat_text_content 实现。
         """
+        # 纯字符串最常见，用精确类型比较优先返回
+        t = type(content)
+        if t is str:
+            return content
         if content is None:
             return None
-        if isinstance(content, str):
-            return content
-        if isinstance(content, list):
+        if t is list or isinstance(content, list):
             text_parts = []
             for item in content:
-                if isinstance(item, str):
+                if type(item) is str or isinstance(item, str):
                     text_parts.append(item)
                 elif isinstance(item, dict) and item.get("type") == "text":
                     text_parts.append(item.get("text", ""))
             return "".join(text_parts) if text_parts else None
         return None
 
+    def _content_part_image(self, part: Dict[str, Any], images: List[Any]) -> Optional[str]:
+        """处理图像类型的内容部分，解析成功的图像追加到 images"""
+        image = self._parse_image_content(part)
+        if image is not None:
+            images.append(image)
+            logging.info(f"Parsed image content: {image.size}")
+        else:
+            logging.warning(f"Failed to parse image content")
+        return None
+
+    def _content_part_refusal(self, part: Dict[str, Any], images: List[Any]) -> Optional[str]:
+        """处理 refusal 类型的内容部分，返回需要拼接的文本"""
+        return part.get('refusal', '') or None
+
+    # 内容部分类型 -> 处理函数（text 在循环中内联处理）
+    _CONTENT_PART_HANDLERS = {
+        'image_url': _content_part_image,
+        'image': _content_part_image,
+        'refusal': _content_part_refusal,
+    }
+
     def _parse_chat_message_content(
         self,
         role: ChatCompletionRole,
@@ -302,60 +503,52 @@ class FastLLmCompletion:
         参考 vLLM 的实现，增强对复杂消息格式的兼容性。
         返回 (消息列表, 图像列表)
         """
+        t = type(content)
+        if t is str:
+            return [ConversationMessage(role=role, content=content)], []
         if content is None:
             return [ConversationMessage(role=role, content="")], []
-        if isinstance(content, str):
-            return [ConversationMessage(role=role, content=content)], []
-        if isinstance(content, list):
-            content_str = ""
+        if t is list or isinstance(content, list):
+            # 文本片段最后用 "\n" 一次拼接；开头的空片段不产生分隔符，与逐段追加时的行为一致
+            text_parts: List[str] = []
             images = []  # 收集图像
             for it in content:
                 # 处理纯字符串元素
                 if isinstance(it, str):
-                    if content_str:
-                        content_str += "\n"
-                    content_str += it
+                    if it or text_parts:
+                        text_parts.append(it)
                     continue
                 # 处理字典格式的内容部分
-                if isinstance(it, dict):
+                if type(it) is dict or isinstance(it, dict):
                     part_type = it.get('type', '')
-                    # 处理文本类型
+                    # 文本类型最常见，直接处理
                     if part_type == 'text':
-                        if content_str:
-                            content_str += "\n"
-                        content_str += it.get('text', '')
-                    # 处理图像类型
-                    elif part_type in ('image_url', 'image'):
-                        image = self._parse_image_content(it)
-                        if image is not None:
-                            images.append(image)
-                            logging.info(f"Parsed image content: {image.size}")
-                        else:
-                            logging.warning(f"Failed to parse image content")
-                    # 跳过工具调用相关内容（由 _parse_chat_message 统一处理）
-                    elif part_type in ('tool_use', 'tool_result', 'tool_calls', 'function'):
-                        logging.debug(f"Skipping tool-related content in content array: {part_type}")
-                        continue
-                    # 音频和视频暂不支持
-                    elif part_type in ('audio', 'audio_url', 'video', 'video_url', 'input_audio'):
-                        logging.warning(f"Multimodal content type not supported: {part_type}")
-                        continue
-                    # 处理 refusal 类型
-                    elif part_type == 'refusal':
-                        refusal_text = it.get('refusal', '')
-                        if refusal_text:
-                            if content_str:
-                                content_str += "\n"
-                            content_str += refusal_text
-                    # 跳过其他未知类型，记录警告但不报错
+                        text = it.get('text', '')
                     else:
-                        logging.warning(f"Skipping unknown content type: {part_type}")
-                        continue
+                        handler = self._CONTENT_PART_HANDLERS.get(part_type)
+                        if handler is not None:
+                            text = handler(self, it, images)
+                        # 跳过工具调用相关内容（由 _parse_chat_message 统一处理）
+                        elif part_type in _TOOL_PART_TYPES:
+                            logging.debug(f"Skipping tool-related content in content array: {part_type}")
+                            continue
+                        # 音频和视频暂不支持
+                        elif part_type in _UNSUPPORTED_MEDIA_PART_TYPES:
+                            logging.warning(f"Multimodal content type not supported: {part_type}")
+                            continue
+                        # 跳过其他未知类型，记录警告但不报错
+                        else:
+                            logging.warning(f"Skipping unknown content type: {part_type}")
+                            continue
+                        if text is None:
+                            continue
+                    if text or text_parts:
+                        text_parts.append(text)
                 else:
                     # 跳过不支持的格式
                     logging.warning(f"Skipping unsupported content format: {type(it)}")
                     continue
-            msg = ConversationMessage(role=role, content=content_str, images=images if images else None)
+            msg = ConversationMessage(role=role, content="\n".join(text_parts), images=images if images else None)
             return [msg], images
         # 暂时不支持其他格式的输入
         logging.warning(f"Unsupported content type: {type(content)}")
@@ -419,6 +612,19 @@ class FastLLmCompletion:
         
         return result
 
+    def _parse_conversation(self, messages: List[Dict[str, Any]]) -> Tuple[List[ConversationMessage], List[Any]]:
+        """解析请求中的全部消息，返回 (消息列表, 所有图像)"""
+        conversation: List[ConversationMessage] = []
+        all_images: List[Any] = []  # 收集所有图像
+        for m in messages:
+            parsed_messages = self._parse_chat_message(m)
+            for msg in parsed_messages:
+                conversation.append(msg)
+                # 收集图像
+                if msg.images:
+                    all_images.extend(msg.images)
+        return conversation, all_images
+
     async def create_chat_completion(
         self, request: ChatCompletionRequest, raw_request: Request
     ) -> Union[ErrorResponse, AsyncGenerator[str, None],
@@ -448,23 +654,22 @@ class FastLLmCompletion:
             request.messages.append({"role": "user", "content": request.prompt})
         try:
             # 使用新的 _parse_chat_message 方法解析完整消息
-            conversation: List[ConversationMessage] = []
-            all_images: List[Any] = []  # 收集所有图像
-            for m in request.messages:
-                parsed_messages = self._parse_chat_message(m)
-                for msg in parsed_messages:
-                    conversation.append(msg)
-                    # 收集图像
-                    if msg.images:
-                        all_images.extend(msg.images)
+            if any(isinstance(m, dict) and isinstance(m.get("content"), list) for m in request.messages):
+                # 内容数组中可能含图像，base64 / PIL 解码及 URL 下载放到线程中执行，避免阻塞事件循环
+                conversation, all_images = await asyncio.to_thread(self._parse_conversation, request.messages)
+            else:
+                conversation, all_images = self._parse_conversation(request.messages)
 
             if len(conversation) == 0:
                 raise Exception("Empty msg")
             
             # 转换为模型需要的格式，保留所有字段
-            messages = []
-            for msg in conversation:
-                messages.append(msg.to_dict())
+            # 纯文本对话（最常见）只有 role/content，直接构造字典
+            if all(msg.content is not None and msg.tool_calls is None and msg.tool_call_id is None
+                   and msg.name is None and msg.reasoning is None for msg in conversation):
+                messages = [{"role": msg.role, "content": msg.content} for msg in conversation]
+            else:
+                messages = [msg.to_dict() for msg in conversation]
             
             # 图像信息（用于多模态模型）
             images = all_images if all_images else None
@@ -472,8 +677,7 @@ class FastLLmCompletion:
                 logging.info(f"Detected {len(images)} images in request")
 
         except Exception as e:
-            logging.error("Error in applying chat template from request: %s", e)
-            traceback.print_exc()
+            logging.exception("Error in applying chat template from request: %s", e)
             return self.create_error_response(str(e))
 
         request_id = f"fastllm-{self.model_name}-{random_uuid()}"
@@ -490,17 +694,15 @@ class FastLLmCompletion:
             logging.debug(f"fastllm input message: {messages}")
             # logging.debug(f"input tokens: {input_token_len}")
 
-        input_token_len = self.model.get_input_token_len(messages)
-
-        tools = [tool.model_dump(exclude_none=True) for tool in request.tools] if request.tools is not None else None
+        tools = _TOOLS_ADAPTER.dump_python(request.tools, exclude_none=True) if request.tools is not None else None
         # print("tools", tools)
 
         # 累计请求数
         self._total_request_count += 1
-        console.request_start(self._total_request_count, request_id)
+        _submit_console(console.request_start, self._total_request_count, request_id)
 
         # from request.tools
-        handle = self.model.launch_stream_response(
+        handle, input_token_len = self.model.launch_stream_response(
             messages,
             max_length=max_length,
             min_length=min_length,
@@ -512,7 +714,10 @@ class FastLLmCompletion:
             tools=tools,
             one_by_one=True,
             images=images,  # 传递图像给多模态模型
+            return_input_len=True,
         )
+        if input_token_len is None:
+            input_token_len = self.model.get_input_token_len(messages)
         # Store the mapping between conversation ID and handle
         self.conversation_handles[request_id] = handle
         logging.debug(f"Created conversation: {request_id}, handle: {handle}")
@@ -549,7 +754,7 @@ class FastLLmCompletion:
         async for res in result_generator:
             result += res
             completion_tokens += 1
-            if await raw_request.is_disconnected():
+            if completion_tokens % _DISCONNECT_CHECK_INTERVAL == 0 and await raw_request.is_disconnected():
                 print("is_disconnected!!!")
                 self.model.abort_handle(handle)
                 logging.debug(f"Abort request: {request_id}")
@@ -595,24 +800,88 @@ class FastLLmCompletion:
             system_fingerprint=self.system_fingerprint
         )
 
-        # 请求处理完成（先输出"请求完成"，再输出统计信息）
-        console.request_complete(request_id)
-
-        # 打印推理统计信息
-        stats = self.model.get_handle_stats(handle)
-        if stats:
-            console.print_inference_stats(
-                stats.prompt_tokens, stats.output_tokens,
-                stats.total_time, stats.first_token_time, stats.speed
-            )
+        # 请求处理完成（完成提示和统计信息由后台线程输出）
+        _submit_console_report(request_id, self.model.get_handle_stats(handle))
 
         # After completion, remove the conversation from tracking dictionary
-        if request_id in self.conversation_handles:
-            del self.conversation_handles[request_id]
+        if self.conversation_handles.pop(request_id, None) is not None:
             logging.debug(f"Removed completed conversation from tracking: {request_id}")
 
         return response
 
+    async def _stream_sse_frames(
+        self,
+        result_generator: AsyncIterator,
+        raw_request: Request,
+        handle: int,
+        request_id: str,
+        build_frame: Callable[[str], Optional[bytes]],
+        build_final: Callable[[], bytes],
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        chat / completion 流式输出共用的主循环
+
+        每个 token 交给 build_frame 生成 SSE 帧（返回 None 表示不输出），短时间内产生的多个帧合并发送；
+        每 _DISCONNECT_CHECK_INTERVAL 个 token 检查一次客户端是否断开，断开时中止 handle 并直接结束。
+        正常结束时 build_final() 生成的结束帧和 [DONE] 随最后一批数据一起发出
+        """
+        loop = asyncio.get_running_loop()
+        flush_interval = self._sse_flush_interval
+        buf = bytearray()
+        last_flush = loop.time()
+        next_task = None
+        token_count = 0
+        try:
+            result_iter = result_generator.__aiter__()
+            while True:
+                if next_task is None:
+                    next_task = asyncio.ensure_future(result_iter.__anext__())
+                if buf:
+                    # 有待发送的数据时限时等待下一个 token，超时先把缓冲发出去
+                    wait_time = flush_interval - (loop.time() - last_flush)
+                    if wait_time > 0:
+                        await asyncio.wait((next_task,), timeout=wait_time)
+                    if not next_task.done():
+                        yield bytes(buf)
+                        buf.clear()
+                        last_flush = loop.time()
+                        continue
+                try:
+                    res = await next_task
+                except StopAsyncIteration:
+                    break
+                finally:
+                    if next_task.done():
+                        next_task = None
+
+                token_count += 1
+                if token_count % _DISCONNECT_CHECK_INTERVAL == 0 and await raw_request.is_disconnected():
+                    self.model.abort_handle(handle)
+                    logging.debug(f"Abort stream request (client disconnected): {request_id}")
+                    return
+
+                frame = build_frame(res)
+                if frame is not None:
+                    buf += frame
+                    if len(buf) >= _SSE_FLUSH_BYTES or loop.time() - last_flush >= flush_interval:
+                        yield bytes(buf)
+                        buf.clear()
+                        last_flush = loop.time()
+
+            buf += build_final()
+            buf += _SSE_DONE
+            yield bytes(buf)
+            buf.clear()
+        except ValueError:
+            # 先把已生成的帧发出去，再由调用方输出错误帧
+            if buf:
+                yield bytes(buf)
+                buf.clear()
+            raise
+        finally:
+            if next_task is not None and not next_task.done():
+                next_task.cancel()
+
     async def chat_completion_stream_generator(
         self,
         request: ChatCompletionRequest,
@@ -622,10 +891,8 @@ class FastLLmCompletion:
         request_id: str,
         input_token_len: int,
         think: bool
-    ) -> AsyncGenerator[str, None]:
-        model_name = self.model_name
+    ) -> AsyncGenerator[bytes, None]:
         created_time = int(time.time())
-        chunk_object_type = "chat.completion.chunk"
 
         # 解析 stream_options
         include_usage = False
@@ -635,36 +902,99 @@ class FastLLmCompletion:
             continuous_usage = request.stream_options.continuous_usage_stats or False
 
         # TODO: 支持request.n 和 request.echo配置
-        first_iteration = True
         completion_tokens = 0
-        try:
-            if first_iteration:
-                # 1. role部分
-                choice_data = ChatCompletionResponseStreamChoice(
-                    index=0,
-                    delta=DeltaMessage(role="assistant"),
-                    logprobs=None,
-                    finish_reason=None
+        request_id_json = _json_dumps(request_id)
+        previous_token_ids = []
+        current_token_ids = []
+        previous_text = ""
+        current_text = ""
+        use_tool_parser = False
+        content_template = None
+
+        def build_frame(delta_text: str) -> Optional[bytes]:
+            nonlocal completion_tokens, previous_text, current_text, previous_token_ids, current_token_ids
+            completion_tokens += 1
+
+            # print("delta_text", delta_text)
+
+            if content_template is not None:
+                return content_template % (request_id_json, created_time, _json_dumps(delta_text))
+
+            # Send token-by-token response for each request.n
+            if use_tool_parser:
+                now_ids = self.tool_parser.get_token_ids(delta_text)
+                # print("delta_text", delta_text, "now_ids", now_ids)
+
+                current_text += delta_text
+                current_token_ids += now_ids
+
+                delta_message = self.tool_parser.extract_tool_calls_streaming(
+                    previous_text=previous_text,
+                    current_text=current_text,
+                    delta_text=delta_text,
+                    previous_token_ids=previous_token_ids,
+                    current_token_ids=current_token_ids,
+                    delta_token_ids=[0],
+                    request=request
                 )
+
+                previous_text += delta_text
+                previous_token_ids += now_ids
+                # print("delta", delta_message)
+                
+                # 处理 parallel_tool_calls=False 时只保留第一个工具调用
+                if delta_message and request.parallel_tool_calls is False:
+                    if delta_message.tool_calls:
+                        # 过滤只保留 index=0 的工具调用
+                        delta_message.tool_calls = [
+                            tc for tc in delta_message.tool_calls if tc.index == 0
+                        ]
+                if not delta_message:
+                    return None
+                delta = delta_message.model_dump(exclude_unset=True, exclude_none=True)
+            else:
+                delta = {"content": delta_text}
+
+            # 如果启用 continuous_usage，每个 chunk 都包含 usage
+            usage_info = None
+            if continuous_usage:
+                usage_info = {
+                    "prompt_tokens": input_token_len,
+                    "total_tokens": input_token_len + completion_tokens,
+                    "completion_tokens": completion_tokens
+                }
+            return self._chat_stream_chunk(request_id, created_time, delta, usage=usage_info)
+
+        def build_final() -> bytes:
+            # 3. 结束标志
+            # 根据 include_usage 决定是否在最后一个 chunk 输出 usage
+            final_usage = None
+            if include_usage or continuous_usage:
+                final_usage = {
+                    "prompt_tokens": input_token_len,
+                    "total_tokens": input_token_len + completion_tokens,
+                    "completion_tokens": completion_tokens
+                }
+            return self._chat_stream_chunk(request_id, created_time, {}, finish_reason='stop', usage=final_usage)
+
+        frames = self._stream_sse_frames(
+            result_generator, raw_request, handle, request_id, build_frame, build_final
+        )
+        try:
+            # 1. role部分
+            if continuous_usage:
                 # 如果启用 continuous_usage，在首个 chunk 就包含 usage
-                usage_info = None
-                if continuous_usage:
-                    usage_info = UsageInfo(
-                        prompt_tokens=input_token_len,
-                        total_tokens=input_token_len,
-                        completion_tokens=0
-                    )
-                chunk = ChatCompletionStreamResponseWithUsage(
-                    id=request_id,
-                    object=chunk_object_type,
-                    created=created_time,
-                    choices=[choice_data],
-                    model=model_name,
-                    usage=usage_info
+                usage_info = {
+                    "prompt_tokens": input_token_len,
+                    "total_tokens": input_token_len,
+                    "completion_tokens": 0
+                }
+                yield self._chat_stream_chunk(
+                    request_id, created_time, {"role": "assistant"},
+                    usage=usage_info, with_fingerprint=False
                 )
-                data = chunk.model_dump_json(exclude_unset=True, exclude_none=True)
-                yield f"data: {data}\n\n"
-                first_iteration = False
+            else:
+                yield self._role_chunk_template % (request_id_json, created_time)
 
             # 2. content部分
 
@@ -678,112 +1008,16 @@ class FastLLmCompletion:
                     force_type=self.model.tool_call_parser
                 )(self.model.hf_tokenizer)
 
-            previous_token_ids = []
-            current_token_ids = []
-            previous_text = ""
-            current_text = ""
+            use_tool_parser = bool(self.tool_parser and request.tools)
+            # 无工具解析且不带逐帧 usage 时，直接套用预生成的模板输出纯文本增量
+            content_template = None if use_tool_parser or continuous_usage else self._content_chunk_template
 
-            async for res in result_generator:
-                if await raw_request.is_disconnected():
-                    self.model.abort_handle(handle)
-                    logging.debug(f"Abort stream request (client disconnected): {request_id}")
-                    return
-                completion_tokens += 1
-                delta_text = res
-
-                # print("delta_text", delta_text)
-
-                # Send token-by-token response for each request.n
-                if self.tool_parser and request.tools:
-                    now_ids = self.tool_parser.get_token_ids(delta_text)
-                    # print("delta_text", delta_text, "now_ids", now_ids)
-
-                    current_text += delta_text
-                    current_token_ids += now_ids
-
-                    delta_message = self.tool_parser.extract_tool_calls_streaming(
-                        previous_text=previous_text,
-                        current_text=current_text,
-                        delta_text=delta_text,
-                        previous_token_ids=previous_token_ids,
-                        current_token_ids=current_token_ids,
-                        delta_token_ids=[0],
-                        request=request
-                    )
-
-                    previous_text += delta_text
-                    previous_token_ids += now_ids
-                    # print("delta", delta_message)
-                    
-                    # 处理 parallel_tool_calls=False 时只保留第一个工具调用
-                    if delta_message and request.parallel_tool_calls is False:
-                        if delta_message.tool_calls:
-                            # 过滤只保留 index=0 的工具调用
-                            delta_message.tool_calls = [
-                                tc for tc in delta_message.tool_calls if tc.index == 0
-                            ]
-                else:
-                    delta_message = DeltaMessage(content=delta_text)
-
-                if delta_message:
-                    choice_data = ChatCompletionResponseStreamChoice(
-                        index=0,
-                        # delta = DeltaMessage(content = delta_text),
-                        delta=delta_message,
-                        logprobs=None,
-                        finish_reason=None
-                    )
-                    # 如果启用 continuous_usage，每个 chunk 都包含 usage
-                    usage_info = None
-                    if continuous_usage:
-                        usage_info = UsageInfo(
-                            prompt_tokens=input_token_len,
-                            total_tokens=input_token_len + completion_tokens,
-                            completion_tokens=completion_tokens
-                        )
-                    chunk = ChatCompletionStreamResponseWithUsage(
-                        id=request_id,
-                        object=chunk_object_type,
-                        created=created_time,
-                        choices=[choice_data],
-                        model=model_name,
-                        usage=usage_info,
-                        system_fingerprint=self.system_fingerprint
-                    )
-                    data = chunk.model_dump_json(exclude_unset=True, exclude_none=True)
-                    yield f"data: {data}\n\n"
-                # await asyncio.sleep(0)
-
-            # 3. 结束标志
-            choice_data = ChatCompletionResponseStreamChoice(
-                index=0,
-                delta=DeltaMessage(),
-                logprobs=None,
-                finish_reason='stop'
-            )
-            # 根据 include_usage 决定是否在最后一个 chunk 输出 usage
-            final_usage = None
-            if include_usage or continuous_usage:
-                final_usage = UsageInfo(
-                    prompt_tokens=input_token_len,
-                    total_tokens=input_token_len + completion_tokens,
-                    completion_tokens=completion_tokens
-                )
-            chunk = ChatCompletionStreamResponseWithUsage(
-                id=request_id,
-                object=chunk_object_type,
-                created=created_time,
-                choices=[choice_data],
-                model=model_name,
-                usage=final_usage,
-                system_fingerprint=self.system_fingerprint
-            )
-            data = chunk.model_dump_json(exclude_unset=True, exclude_none=True)
-            yield f"data: {data}\n\n"
+            async for data in frames:
+                yield data
         except ValueError as e:
             data = self.create_streaming_error_response(str(e))
-            yield f"data: {data}\n\n"
-            await asyncio.sleep(0)
+            yield _SSE_FRAME % data.encode("utf-8")
+            yield _SSE_DONE
         except asyncio.CancelledError:
             # 客户端断开通常会触发取消；确保模型侧也尽快停止
             try:
@@ -793,27 +1027,14 @@ class FastLLmCompletion:
                 pass
             raise
         finally:
-            # 请求处理完成（先输出"请求完成"，再输出统计信息）
-            console.request_complete(request_id)
-            
-            # 打印推理统计信息
-            stats = self.model.get_handle_stats(handle)
-            if stats:
-                console.print_inference_stats(
-                    stats.prompt_tokens, stats.output_tokens,
-                    stats.total_time, stats.first_token_time, stats.speed
-                )
-            else:
-                logging.debug(f"无法获取请求 {request_id} 的统计信息")
+            await frames.aclose()
+            # 请求处理完成（完成提示和统计信息由后台线程输出）
+            _submit_console_report(request_id, self.model.get_handle_stats(handle))
             
             # 正常结束时不要调用 abort，否则会破坏历史 KV cache 写入，导致每轮 Long Prefill。
-            if request_id in self.conversation_handles:
-                del self.conversation_handles[request_id]
+            if self.conversation_handles.pop(request_id, None) is not None:
                 logging.debug(f"已移除已完成的流式对话: {request_id}")
 
-        yield "data: [DONE]\n\n"
-        await asyncio.sleep(0)
-
     def create_streaming_error_response(
         self,
         message: str,
@@ -830,29 +1051,24 @@ class FastLLmCompletion:
         return json_str
 
     def abort_conversation(self, conversation_id: str) -> bool:
-        if conversation_id in self.conversation_handles:
-            handle = self.conversation_handles[conversation_id]
-            try:
-                self.model.abort_handle(handle)
-                logging.debug(f"Aborted conversation: {conversation_id}, handle: {handle}")
-                # Remove the conversation from the mapping
-                del self.conversation_handles[conversation_id]
-                return True
-            except Exception as e:
-                logging.error(f"Error aborting conversation {conversation_id}: {e}")
-                return False
-        else:
+        # 取出即从映射中移除，只做一次查找
+        handle = self.conversation_handles.pop(conversation_id, _MISSING)
+        if handle is _MISSING:
             logging.warning(f"Conversation ID not found: {conversation_id}")
             return False
+        try:
+            self.model.abort_handle(handle)
+            logging.debug(f"Aborted conversation: {conversation_id}, handle: {handle}")
+            return True
+        except Exception as e:
+            logging.error(f"Error aborting conversation {conversation_id}: {e}")
+            return False
 
     def get_active_conversations(self) -> List[Dict[str, Any]]:
-        result = []
-        for conversation_id, handle in self.conversation_handles.items():
-            result.append({
-                "conversation_id": conversation_id,
-                "handle": handle
-            })
-        return result
+        return [
+            {"conversation_id": conversation_id, "handle": handle}
+            for conversation_id, handle in list(self.conversation_handles.items())
+        ]
 
     # ==================== /v1/completions 支持 ====================
     
@@ -864,7 +1080,7 @@ class FastLLmCompletion:
         """
         处理 /v1/completions 请求（非 chat 风格的文本补全）
         """
-        request_id = f"cmpl-{shortuuid.random()}"
+        request_id = f"cmpl-{random_short_id()}"
         
         # 处理 prompt - 可能是字符串或字符串列表
         if isinstance(request.prompt, list):
@@ -881,14 +1097,12 @@ class FastLLmCompletion:
         # 计算 max_tokens
         max_length = request.max_tokens or 16
         
-        # 使用模型生成
-        input_token_len = self.model.get_input_token_len(prompt)
-        
         # 累计请求数
         self._total_request_count += 1
-        console.request_start(self._total_request_count, request_id)
+        _submit_console(console.request_start, self._total_request_count, request_id)
         
-        handle = self.model.launch_stream_response(
+        # 使用模型生成（输入 token 数由同一次分词得到）
+        handle, input_token_len = self.model.launch_stream_response(
             prompt,
             max_length=max_length,
             do_sample=True,
@@ -897,7 +1111,10 @@ class FastLLmCompletion:
             temperature=request.temperature,
             repeat_penalty=request.frequency_penalty,
             one_by_one=True,
+            return_input_len=True,
         )
+        if input_token_len is None:
+            input_token_len = self.model.get_input_token_len(prompt)
         
         self.conversation_handles[request_id] = handle
         result_generator = self.model.stream_response_handle_async(handle)
@@ -905,13 +1122,13 @@ class FastLLmCompletion:
         if request.stream:
             return (
                 self._completion_stream_generator(
-                    request, raw_request, handle, result_generator, request_id, input_token_len
+                    request, raw_request, handle, result_generator, request_id, input_token_len, prompt, max_length
                 ),
                 None
             )
         else:
             return await self._completion_full_generator(
-                request, raw_request, handle, result_generator, request_id, input_token_len
+                request, raw_request, handle, result_generator, request_id, input_token_len, prompt, max_length
             )
     
     async def _completion_full_generator(
@@ -921,9 +1138,11 @@ class FastLLmCompletion:
         handle: int,
         result_generator: AsyncIterator,
         request_id: str,
-        input_token_len: int
+        input_token_len: int,
+        prompt: str,
+        max_length: int
     ) -> Union[ErrorResponse, CompletionResponse]:
-        """非流式 completion 响应"""
+        """非流式 completion 响应（prompt、max_length 为 create_completion 中规范化后的值）"""
         model_name = self.model_name
         created_time = int(time.time())
         result = ""
@@ -931,20 +1150,18 @@ class FastLLmCompletion:
         
         # 如果 echo=True，先添加原始 prompt
         if request.echo:
-            result = request.prompt if isinstance(request.prompt, str) else request.prompt[0]
+            result = prompt
         
         async for res in result_generator:
             result += res
             completion_tokens += 1
-            if await raw_request.is_disconnected():
+            if completion_tokens % _DISCONNECT_CHECK_INTERVAL == 0 and await raw_request.is_disconnected():
                 self.model.abort_handle(handle)
                 logging.debug(f"Abort completion request: {request_id}")
                 return self.create_error_response("Client disconnected")
         
         # 确定 finish_reason
-        finish_reason = "stop"
-        if completion_tokens >= (request.max_tokens or 16):
-            finish_reason = "length"
+        finish_reason = "length" if completion_tokens >= max_length else "stop"
         
         choice_data = CompletionResponseChoice(
             index=0,
@@ -965,19 +1182,10 @@ class FastLLmCompletion:
             )
         )
         
-        # 请求处理完成（先输出“请求完成”，再输出统计信息）
-        console.request_complete(request_id)
-        
-        # 打印推理统计信息
-        stats = self.model.get_handle_stats(handle)
-        if stats:
-            console.print_inference_stats(
-                stats.prompt_tokens, stats.output_tokens,
-                stats.total_time, stats.first_token_time, stats.speed
-            )
+        # 请求处理完成（完成提示和统计信息由后台线程输出）
+        _submit_console_report(request_id, self.model.get_handle_stats(handle))
         
-        if request_id in self.conversation_handles:
-            del self.conversation_handles[request_id]
+        self.conversation_handles.pop(request_id, None)
         
         return response
     
@@ -988,85 +1196,49 @@ class FastLLmCompletion:
         handle: int,
         result_generator: AsyncIterator,
         request_id: str,
-        input_token_len: int
-    ) -> AsyncGenerator[str, None]:
-        """流式 completion 响应"""
+        input_token_len: int,
+        prompt: str,
+        max_length: int
+    ) -> AsyncGenerator[bytes, None]:
+        """流式 completion 响应（prompt、max_length 为 create_completion 中规范化后的值）"""
         model_name = self.model_name
         created_time = int(time.time())
         completion_tokens = 0
-        
-        try:
-            # 如果 echo=True，先发送原始 prompt
-            if request.echo:
-                echo_text = request.prompt if isinstance(request.prompt, str) else request.prompt[0]
-                choice_data = CompletionResponseStreamChoice(
-                    index=0,
-                    text=echo_text,
-                    logprobs=None,
-                    finish_reason=None
-                )
-                chunk = CompletionStreamResponse(
-                    id=request_id,
-                    created=created_time,
-                    model=model_name,
-                    choices=[choice_data]
-                )
-                yield f"data: {chunk.model_dump_json(exclude_unset=True)}\n\n"
-            
-            async for res in result_generator:
-                if await raw_request.is_disconnected():
-                    self.model.abort_handle(handle)
-                    logging.debug(f"Abort completion stream: {request_id}")
-                    return
-                
-                completion_tokens += 1
-                
-                choice_data = CompletionResponseStreamChoice(
-                    index=0,
-                    text=res,
-                    logprobs=None,
-                    finish_reason=None
-                )
-                chunk = CompletionStreamResponse(
-                    id=request_id,
-                    created=created_time,
-                    model=model_name,
-                    choices=[choice_data]
-                )
-                yield f"data: {chunk.model_dump_json(exclude_unset=True)}\n\n"
-            
+        # 每帧只有 text / finish_reason 变化，复用同一个 dict 直接序列化
+        # 字段与 CompletionStreamResponse.model_dump_json(exclude_unset=True) 的输出一致
+        choice = {"index": 0, "text": "", "logprobs": None, "finish_reason": None}
+        chunk = {"id": request_id, "created": created_time, "model": model_name, "choices": [choice]}
+        # echo=True 时原始 prompt 并入第一帧输出，不单独发送一帧
+        pending_echo = prompt if request.echo else ""
+
+        def build_frame(res: str) -> bytes:
+            nonlocal completion_tokens, pending_echo
+            completion_tokens += 1
+            if pending_echo:
+                res = pending_echo + res
+                pending_echo = ""
+            choice["text"] = res
+            return _SSE_FRAME % _json_dumps(chunk)
+
+        def build_final() -> bytes:
             # 发送最终 chunk
-            finish_reason = "stop"
-            if completion_tokens >= (request.max_tokens or 16):
-                finish_reason = "length"
+            finish_reason = "length" if completion_tokens >= max_length else "stop"
             
-            choice_data = CompletionResponseStreamChoice(
-                index=0,
-                text="",
-                logprobs=None,
-                finish_reason=finish_reason
-            )
-            chunk = CompletionStreamResponse(
-                id=request_id,
-                created=created_time,
-                model=model_name,
-                choices=[choice_data]
-            )
-            yield f"data: {chunk.model_dump_json(exclude_unset=True)}\n\n"
+            # 没有生成任何 token 时 echo 内容随结束帧发出
+            choice["text"] = pending_echo
+            choice["finish_reason"] = finish_reason
+            return _SSE_FRAME % _json_dumps(chunk)
+
+        frames = self._stream_sse_frames(
+            result_generator, raw_request, handle, request_id, build_frame, build_final
+        )
+        try:
+            async for data in frames:
+                yield data
             
         finally:
-            # 请求处理完成（先输出“请求完成”，再输出统计信息）
-            console.request_complete(request_id)
+            await frames.aclose()
+            # 请求处理完成（完成提示和统计信息由后台线程输出）
+            _submit_console_report(request_id, self.model.get_handle_stats(handle))
             
-            # 打印推理统计信息
-            stats = self.model.get_handle_stats(handle)
-            if stats:
-                console.print_inference_stats(
-                    stats.prompt_tokens, stats.output_tokens,
-                    stats.total_time, stats.first_token_time, stats.speed
-                )
-            
-            if request_id in self.conversation_handles:
-                del self.conversation_handles[request_id]
-        
-        yield "data: [DONE]\n\n"
+            self.conversation_handles.pop(request_id, None)
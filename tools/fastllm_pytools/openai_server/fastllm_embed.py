@@ -1,17 +1,125 @@
 import asyncio
+import hashlib
 import logging
 import json
 import traceback
+from array import array
+from collections import OrderedDict
 from fastapi import Request
 
 from .protocal.openai_protocol import *
 
+# 微批处理窗口（毫秒）：收到第一个请求后最多等待这么久来凑批
+BATCH_WINDOW_MS = 5
+# 未指定 --max_batch 时的默认批大小
+_DEFAULT_MAX_BATCH = 32
+
+class EmbeddingBatcher:
+  """把并发的 embedding 请求合并为一次批量前向（按 normalize 分组）"""
+  def __init__(self, model, max_batch: int = _DEFAULT_MAX_BATCH, window_ms: float = BATCH_WINDOW_MS, executor = None):
+    self.model = model
+    # 批量前向在该线程池中执行，不阻塞事件循环
+    self.executor = executor
+    self.max_batch = max_batch if max_batch > 0 else _DEFAULT_MAX_BATCH
+    self.window = window_ms / 1000.0
+    self._queue = None
+    self._task = None
+
+  def _ensure_started(self):
+    # 事件循环在 uvicorn.run 之后才存在，因此首次提交时再启动后台任务
+    if self._task is None or self._task.done():
+      self._queue = asyncio.Queue()
+      self._task = asyncio.get_running_loop().create_task(self._worker())
+
+  async def submit(self, text: str, normalize: bool) -> List[float]:
+    self._ensure_started()
+    future = asyncio.get_running_loop().create_future()
+    self._queue.put_nowait((text, normalize, future))
+    return await future
+
+  async def _collect(self):
+    loop = asyncio.get_running_loop()
+    batch = [await self._queue.get()]
+    deadline = loop.time() + self.window
+    while len(batch) < self.max_batch:
+      if not self._queue.empty():
+        batch.append(self._queue.get_nowait())
+        continue
+      timeout = deadline - loop.time()
+      if timeout <= 0:
+        break
+      try:
+        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+      except asyncio.TimeoutError:
+        break
+    return batch
+
+  async def _run_batch(self, batch):
+    loop = asyncio.get_running_loop()
+    groups = {}
+    for item in batch:
+      if not item[2].cancelled():
+        groups.setdefault(item[1], []).append(item)
+    for normalize, items in groups.items():
+      try:
+        results = await loop.run_in_executor(self.executor, self.model.embedding_sentences_batch,
+                                             [item[0] for item in items], normalize)
+      except Exception as e:
+        logging.exception("Embedding batch failed")
+        for item in items:
+          if not item[2].done():
+            item[2].set_exception(e)
+        continue
+      for item, result in zip(items, results):
+        if not item[2].done():
+          item[2].set_result(result)
+
+  async def _worker(self):
+    while True:
+      await self._run_batch(await self._collect())
+
 class FastLLmEmbed:
+  # embedding 结果 LRU 缓存的容量上限（字节）；同一模型下输入相同则向量相同
+  _CACHE_MAX_BYTES = 64 << 20
+
   def __init__(self,
                model_name,
-               model):
+               model,
+               max_batch: int = -1,
+               executor = None):
     self.model_name = model_name
     self.model = model
+    self.batcher = EmbeddingBatcher(model, max_batch, executor = executor)
+    # 向量以 float32 的 array 紧凑存储，返回时再转为 list；只在事件循环线程中访问，无需加锁
+    self._cache: "OrderedDict[bytes, array]" = OrderedDict()
+    self._cache_bytes = 0
+    self.cache_hits = 0
+    self.cache_misses = 0
 
   def embedding_sentence(self, request: EmbedRequest, raw_request: Request):
       return self.model.embedding_sentence(request.inputs, request.normalize)
+
+  async def embedding_sentence_batched(self, request: EmbedRequest, raw_request: Request):
+      normalize = bool(request.normalize)
+      key = hashlib.blake2b(request.inputs.encode("utf-8"), digest_size = 16,
+                            person = b"norm" if normalize else b"raw").digest()
+      cached = self._cache.get(key)
+      if cached is not None:
+        self._cache.move_to_end(key)
+        self.cache_hits += 1
+        return cached.tolist()
+      self.cache_misses += 1
+      embedding = await self.batcher.submit(request.inputs, normalize)
+      if key not in self._cache:
+        # 模型输出本就是 float32，转存不损失精度
+        packed = array('f', embedding)
+        self._cache[key] = packed
+        self._cache_bytes += packed.itemsize * len(packed)
+        while self._cache_bytes > self._CACHE_MAX_BYTES and len(self._cache) > 1:
+          _, evicted = self._cache.popitem(last = False)
+          self._cache_bytes -= evicted.itemsize * len(evicted)
+      return embedding
+
+  def cache_stats(self) -> Dict[str, int]:
+      return {"size": len(self._cache), "bytes": self._cache_bytes, "capacity_bytes": self._CACHE_MAX_BYTES,
+              "hits": self.cache_hits, "misses": self.cache_misses}
@@ -1,4 +1,5 @@
 from .protocal.openai_protocol import ModelCard, ModelList, ModelPermission
+import json
 import time
 
 
@@ -37,4 +38,6 @@ class FastLLmModel:
             data=[model_card]
         )
         
-        self.response = model_list.model_dump()
\ No newline at end of file
+        self.response = model_list.model_dump()
+        # 模型列表在运行期间不变，预先序列化（格式与 JSONResponse 一致），/v1/models 直接返回
+        self.response_bytes = json.dumps(self.response, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
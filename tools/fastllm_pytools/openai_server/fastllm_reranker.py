@@ -9,9 +9,11 @@ from .protocal.openai_protocol import *
 class FastLLmReranker:
   def __init__(self,
                model_name,
-               model):
+               model,
+               executor = None):
     self.model_name = model_name
     self.model = model
+    self.executor = executor
 
   def rerank(self, request: RerankRequest, raw_request: Request):
       query = request.query
@@ -27,3 +29,8 @@ class FastLLmReranker:
         ret.append(now)
       ret = sorted(ret, key = lambda x : -x['score'])
       return ret
+
+  async def rerank_async(self, request: RerankRequest, raw_request: Request):
+      # 阻塞的 C++ 调用放到线程池中执行，避免卡住事件循环上的流式请求
+      loop = asyncio.get_running_loop()
+      return await loop.run_in_executor(self.executor, self.rerank, request, raw_request)
@@ -4,13 +4,36 @@ from __future__ import annotations
 
 from typing import Literal, Optional, List, Dict, Any, Union, TYPE_CHECKING
 
+import os
+import random
 import time
-import uuid
 
-import shortuuid
 from pydantic import BaseModel, Field
 
 
+# 请求 id 只需唯一、无需密码学强度：用一次 urandom 播种的 PRNG 生成，避免每个请求一次系统调用
+_rng = random.Random(os.urandom(16))
+if hasattr(os, "register_at_fork"):
+    # fork 出的子进程重新播种，避免多个 worker 生成相同 id
+    os.register_at_fork(after_in_child=lambda: _rng.seed(os.urandom(16)))
+
+_BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def random_uuid() -> str:
+    return f"{_rng.getrandbits(128):032x}"
+
+
+def random_short_id() -> str:
+    """22 位 base62 随机串（128 bit），替代 shortuuid.random()"""
+    n = _rng.getrandbits(128)
+    chars = []
+    for _ in range(22):
+        n, r = divmod(n, 62)
+        chars.append(_BASE62_ALPHABET[r])
+    return "".join(chars)
+
+
 class ErrorResponse(BaseModel):
     """OpenAI 标准错误响应格式"""
     object: str = "error"
@@ -21,7 +44,7 @@ class ErrorResponse(BaseModel):
 
 
 class ModelPermission(BaseModel):
-    id: str = Field(default_factory=lambda: f"modelperm-{shortuuid.random()}")
+    id: str = Field(default_factory=lambda: f"modelperm-{random_short_id()}")
     object: str = "model_permission"
     created: int = Field(default_factory=lambda: int(time.time()))
     allow_create_engine: bool = False
@@ -161,9 +184,9 @@ class ChatCompletionResponseChoice(BaseModel):
 
 
 class ChatCompletionResponse(BaseModel):
-    id: str = Field(default_factory=lambda: f"chatcmpl-{shortuuid.random()}")
+    id: str = Field(default_factory=lambda: f"chatcmpl-{random_short_id()}")
     object: str = "chat.completion"
-    created: int = Field(default_factory=lambda: int(time.time()))
+    created: int
     model: str
     choices: List[ChatCompletionResponseChoice]
     usage: UsageInfo
@@ -191,7 +214,7 @@ class FunctionCall(BaseModel):
     arguments: str
 
 class ToolCall(BaseModel):
-    id: str = Field(default_factory=lambda: "fastllm-tool-" + str(uuid.uuid4().hex))
+    id: str = Field(default_factory=lambda: "fastllm-tool-" + random_uuid())
     type: Literal["function"] = "function"
     function: FunctionCall
 
@@ -240,9 +263,9 @@ class ChatCompletionResponseStreamChoice(BaseModel):
 
 
 class ChatCompletionStreamResponse(BaseModel):
-    id: str = Field(default_factory=lambda: f"chatcmpl-{shortuuid.random()}")
+    id: str = Field(default_factory=lambda: f"chatcmpl-{random_short_id()}")
     object: str = "chat.completion.chunk"
-    created: int = Field(default_factory=lambda: int(time.time()))
+    created: int
     model: str
     choices: List[ChatCompletionResponseStreamChoice]
     usage: Optional[UsageInfo] = None  # Usage info (when stream_options.include_usage=True)
@@ -311,9 +334,9 @@ class CompletionResponseChoice(BaseModel):
 
 
 class CompletionResponse(BaseModel):
-    id: str = Field(default_factory=lambda: f"cmpl-{shortuuid.random()}")
+    id: str = Field(default_factory=lambda: f"cmpl-{random_short_id()}")
     object: str = "text_completion"
-    created: int = Field(default_factory=lambda: int(time.time()))
+    created: int
     model: str
     choices: List[CompletionResponseChoice]
     usage: UsageInfo
@@ -327,9 +350,9 @@ class CompletionResponseStreamChoice(BaseModel):
 
 
 class CompletionStreamResponse(BaseModel):
-    id: str = Field(default_factory=lambda: f"cmpl-{shortuuid.random()}")
+    id: str = Field(default_factory=lambda: f"cmpl-{random_short_id()}")
     object: str = "text_completion"
-    created: int = Field(default_factory=lambda: int(time.time()))
+    created: int
     model: str
     choices: List[CompletionResponseStreamChoice]
 
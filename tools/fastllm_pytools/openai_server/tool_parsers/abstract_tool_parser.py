@@ -13,7 +13,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 def random_tool_call_id() -> str:
-    return "fastllm-tool-" + str(uuid.uuid4().hex)
+    return "fastllm-tool-" + random_uuid()
 
 T = TypeVar("T")
 # `collections` helpers
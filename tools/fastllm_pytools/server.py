@@ -1,14 +1,22 @@
 import argparse
+import asyncio
 import fastapi
+import hmac
 import logging
 import sys
 import uvicorn
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .openai_server.protocal.openai_protocol import *
 from .openai_server.fastllm_completion import FastLLmCompletion
 from .openai_server.fastllm_embed import FastLLmEmbed
@@ -31,20 +39,22 @@ def parse_args():
     return parser.parse_args()
 
 app = fastapi.FastAPI()
-# 设置允许的请求来源, 生产环境请做对应变更
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 fastllm_completion:FastLLmCompletion
 fastllm_embed:FastLLmEmbed
 fastllm_model:FastLLmModel
 dev_mode_enabled:bool = False
 
+if orjson is not None:
+    class ORJSONResponse(JSONResponse):
+        """使用 orjson 序列化的 JSONResponse（可直接序列化 numpy 数组）"""
+        media_type = "application/json"
+
+        def render(self, content) -> bytes:
+            return orjson.dumps(content, option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+else:
+    ORJSONResponse = JSONResponse
+
 
 def _display_system_info(args) -> None:
     """显示系统信息（与 C++ 端一致）"""
@@ -115,6 +125,13 @@ def _display_server_config(args) -> None:
     dev_mode = getattr(args, 'dev_mode', False)
     if dev_mode:
         console.config("开发模式", "已启用")
+    if getattr(args, 'enable_cors', False) or dev_mode:
+        console.config("CORS", "已启用")
+
+
+def _model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """用 pydantic 自带的 JSON 序列化直接生成响应体，省去 model_dump 的中间 dict"""
+    return Response(content = model.model_dump_json(), status_code = status_code, media_type = "application/json")
 
 
 @app.post("/v1/chat/completions")
@@ -123,15 +140,14 @@ async def create_chat_completion(request: ChatCompletionRequest,
     generator = await fastllm_completion.create_chat_completion(
         request, raw_request)
     if isinstance(generator, ErrorResponse):
-        return JSONResponse(content = generator.model_dump(),
-                            status_code = generator.code)
+        return _model_response(generator, status_code = generator.code)
     if request.stream:
         return StreamingResponse(content = generator[0],
                                  background = generator[1], 
                                  media_type = "text/event-stream")
     else:
         assert isinstance(generator, ChatCompletionResponse)
-        return JSONResponse(content = generator.model_dump())
+        return _model_response(generator)
 
 
 @app.post("/v1/completions")
@@ -140,22 +156,21 @@ async def create_completion(request: CompletionRequest,
     """OpenAI 兼容的文本补全接口（非 chat 风格）"""
     generator = await fastllm_completion.create_completion(request, raw_request)
     if isinstance(generator, ErrorResponse):
-        return JSONResponse(content = generator.model_dump(),
-                            status_code = generator.code)
+        return _model_response(generator, status_code = generator.code)
     if request.stream:
         return StreamingResponse(content = generator[0],
                                  background = generator[1],
                                  media_type = "text/event-stream")
     else:
         assert isinstance(generator, CompletionResponse)
-        return JSONResponse(content = generator.model_dump())
+        return _model_response(generator)
 
 
 @app.post("/v1/embed")
 async def create_embed(request: EmbedRequest,
                        raw_request: Request):
-    embedding = fastllm_embed.embedding_sentence(request, raw_request)
-    return JSONResponse(embedding)
+    embedding = await fastllm_embed.embedding_sentence_batched(request, raw_request)
+    return ORJSONResponse(embedding)
 
 
 @app.post("/v1/embeddings")
@@ -165,36 +180,36 @@ async def create_embeddings(request: EmbeddingsRequest,
     try:
         # 转换请求格式
         if isinstance(request.input, str):
-            inputs = request.input
+            inputs = [request.input]
         elif isinstance(request.input, list) and len(request.input) > 0:
-            inputs = request.input[0] if isinstance(request.input[0], str) else str(request.input[0])
+            inputs = [item if isinstance(item, str) else str(item) for item in request.input]
         else:
-            return JSONResponse(
+            return ORJSONResponse(
                 content={"error": {"message": "Input cannot be empty", "type": "invalid_request_error"}},
                 status_code=400
             )
         
-        # 使用现有的 embed 功能
-        embed_req = EmbedRequest(inputs=inputs, normalize=True)
-        result = fastllm_embed.embedding_sentence(embed_req, raw_request)
+        # 逐条走缓存 + 微批处理，列表输入可部分命中缓存
+        embeddings = await asyncio.gather(*[
+            fastllm_embed.embedding_sentence_batched(EmbedRequest(inputs=text, normalize=True), raw_request)
+            for text in inputs])
         
         # 转换为 OpenAI 格式
-        embedding_data = result.get("data", [result]) if isinstance(result, dict) else [{"embedding": result}]
-        
+        prompt_tokens = sum(len(text.split()) for text in inputs)
         response = EmbeddingsResponse(
             object="list",
             data=[{
                 "object": "embedding",
-                "embedding": item.get("embedding", item) if isinstance(item, dict) else item,
+                "embedding": embedding,
                 "index": idx
-            } for idx, item in enumerate(embedding_data)],
+            } for idx, embedding in enumerate(embeddings)],
             model=request.model or fastllm_model.model_name,
-            usage=UsageInfo(prompt_tokens=len(inputs.split()), total_tokens=len(inputs.split()))
+            usage=UsageInfo(prompt_tokens=prompt_tokens, total_tokens=prompt_tokens)
         )
-        return JSONResponse(content=response.model_dump())
+        return _model_response(response)
     except Exception as e:
         logging.error(f"Embeddings error: {e}")
-        return JSONResponse(
+        return ORJSONResponse(
             content={"error": {"message": str(e), "type": "internal_error"}},
             status_code=500
         )
@@ -203,104 +218,138 @@ async def create_embeddings(request: EmbeddingsRequest,
 @app.post("/v1/rerank")
 async def create_rerank(request: RerankRequest,
                        raw_request: Request):
-    print(request)
-    scores = fastllm_reranker.rerank(request, raw_request)    
-    return JSONResponse(scores)
+    logging.debug("rerank n=%d", len(request.texts))
+    scores = await fastllm_reranker.rerank_async(request, raw_request)
+    return ORJSONResponse(scores)
 
 
 @app.get("/v1/models")
 async def list_models():
-    model_response = fastllm_model.response
-    return JSONResponse(content = model_response)
+    return Response(content = fastllm_model.response_bytes, media_type = "application/json")
+
+
+# 健康检查 / 版本信息的响应体固定不变，预先序列化
+_HEALTH_BODY = b'{"status":"healthy"}'
+_VERSION_BODY = b'{"version":"1.0.0","engine":"fastllm"}'
 
 
 @app.get("/health")
 async def health_check():
     """健康检查接口"""
-    return JSONResponse(content={"status": "healthy"})
+    return Response(content = _HEALTH_BODY, media_type = "application/json")
 
 
 @app.get("/v1/health")
 async def v1_health_check():
     """v1 健康检查接口"""
-    return JSONResponse(content={"status": "healthy"})
+    return Response(content = _HEALTH_BODY, media_type = "application/json")
 
 
 @app.get("/version")
 async def get_version():
     """获取服务版本信息"""
-    return JSONResponse(content={
-        "version": "1.0.0",
-        "engine": "fastllm"
-    })
+    return Response(content = _VERSION_BODY, media_type = "application/json")
 
 
 @app.post("/v1/cancel")
 async def cancel_generation(request: Request):
     # Check if development mode is enabled
     if not dev_mode_enabled:
-        return JSONResponse(content = {"error": "This API is only available in development mode"}, 
+        return ORJSONResponse(content = {"error": "This API is only available in development mode"}, 
                             status_code = 403)
     
     try:
         json_data = await request.json()
         if 'conversation_id' not in json_data:
-            return JSONResponse(content = {"error": "Missing required parameter: conversation_id"},
+            return ORJSONResponse(content = {"error": "Missing required parameter: conversation_id"},
                                 status_code = 400)
         
         conversation_id = json_data['conversation_id']
         success = fastllm_completion.abort_conversation(conversation_id)
         
         if success:
-            return JSONResponse(content = {"message": f"Conversation {conversation_id} cancelled successfully"})
+            return ORJSONResponse(content = {"message": f"Conversation {conversation_id} cancelled successfully"})
         else:
-            return JSONResponse(content = {"error": f"Failed to cancel conversation {conversation_id}. Conversation not found or already finished."},
+            return ORJSONResponse(content = {"error": f"Failed to cancel conversation {conversation_id}. Conversation not found or already finished."},
                                 status_code = 404)
     except Exception as e:
         logging.error(f"Error cancelling conversation: {e}")
-        return JSONResponse(content = {"error": f"Internal server error: {str(e)}"},
+        return ORJSONResponse(content = {"error": f"Internal server error: {str(e)}"},
                             status_code = 500)
 
+@app.get("/v1/cache_stats")
+async def get_cache_stats():
+    if not dev_mode_enabled:
+        return ORJSONResponse(content = {"error": "This API is only available in development mode"}, 
+                            status_code = 403)
+    return ORJSONResponse(content = {"embedding": fastllm_embed.cache_stats()})
+
 @app.get("/v1/active_conversations")
 async def get_active_conversations():
     # Check if development mode is enabled
     if not dev_mode_enabled:
-        return JSONResponse(content = {"error": "This API is only available in development mode"}, 
+        return ORJSONResponse(content = {"error": "This API is only available in development mode"}, 
                             status_code = 403)
         
     try:
         conversations = fastllm_completion.get_active_conversations()
-        return JSONResponse(content = {
+        return ORJSONResponse(content = {
             "active_conversations": conversations,
             "count": len(conversations)
         })
     except Exception as e:
         logging.error(f"Error getting active conversations: {e}")
-        return JSONResponse(content = {"error": f"Internal server error: {str(e)}"},
+        return ORJSONResponse(content = {"error": f"Internal server error: {str(e)}"},
                             status_code = 500)
 
 def init_logging(log_level = logging.INFO, log_file:str = None):
     logging_format = '%(asctime)s %(process)d %(filename)s[line:%(lineno)d] %(levelname)s: %(message)s'
+    formatter = logging.Formatter(logging_format)
     root = logging.getLogger()
     root.setLevel(log_level)
+    handlers = [logging.StreamHandler(sys.stdout)]
     if log_file is not None:
-        logging.basicConfig(level=log_level, filemode='a', filename=log_file, format=logging_format)
-    stdout_handler = logging.StreamHandler(sys.stdout)
-    stdout_handler.setFormatter(logging.Formatter(logging_format))
-    root.addHandler(stdout_handler)
+        handlers.append(logging.FileHandler(log_file, mode = 'a'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+
+def _select_event_loop() -> str:
+    """选择 uvicorn 的事件循环: POSIX 下 "auto" 已优先使用 uvloop; Windows 上安装了 winloop 时改用 winloop"""
+    if sys.platform != "win32":
+        return "auto"
+    try:
+        import winloop
+    except ImportError:
+        return "auto"
+    winloop.install()
+    # "none" 表示 uvicorn 不再设置事件循环，沿用上面安装的 winloop 策略
+    return "none"
 
 def fastllm_server(args):
+    # CORS 仅浏览器直连时需要，默认不挂载以减少每个请求的中间件开销
+    if args.enable_cors or args.dev_mode:
+        # 设置允许的请求来源, 生产环境请做对应变更
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
     if args.api_key:
+        expected_auth = ("Bearer " + args.api_key).encode("utf-8")
+
         @app.middleware("http")
         async def authentication(request: Request, call_next):
-            print("auth")
             if request.method == "OPTIONS":
                 return await call_next(request)
             url_path = request.url.path            
             if not url_path.startswith("/v1"):
                 return await call_next(request)
-            if request.headers.get("Authorization") != "Bearer " + args.api_key:
-                return JSONResponse(content={"error": "Unauthorized"},
+            # 常量时间比较，避免通过响应时间推测 key
+            if not hmac.compare_digest(request.headers.get("Authorization", "").encode("utf-8"), expected_auth):
+                return ORJSONResponse(content={"error": "Unauthorized"},
                                     status_code=401)
             return await call_next(request)
         
@@ -341,10 +390,14 @@ def fastllm_server(args):
         model_name = args.model_name,
         model = model,
         think = (args.think.lower() != "false"),
-        show_input = args.show_input
+        show_input = args.show_input,
+        sse_flush_ms = getattr(args, 'sse_flush_ms', None)
     )
-    fastllm_embed = FastLLmEmbed(model_name = args.model_name, model = model)
-    fastllm_reranker = FastLLmReranker(model_name = args.model_name, model = model)
+    # embedding / rerank 共用同一个模型和 HF tokenizer（后者不支持并发调用），用单线程池串行执行
+    model_executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "fastllm_embed")
+    fastllm_embed = FastLLmEmbed(model_name = args.model_name, model = model, max_batch = args.max_batch,
+                                 executor = model_executor)
+    fastllm_reranker = FastLLmReranker(model_name = args.model_name, model = model, executor = model_executor)
     fastllm_model = FastLLmModel(model_name = args.model_name)
     
     console.header("服务就绪")
@@ -353,7 +406,7 @@ def fastllm_server(args):
     print()
     
     # 禁用 uvicorn 访问日志，避免与进度条输出冲突
-    uvicorn.run(app, host = args.host, port = args.port, access_log=False)
+    uvicorn.run(app, host = args.host, port = args.port, access_log=False, loop = _select_event_loop())
 
 if __name__ == "__main__":
     args = parse_args()
@@ -37,6 +37,7 @@ def make_normal_parser(des: str, add_help = True) -> argparse.ArgumentParser:
     parser.add_argument('-l', '--low', action = 'store_true', help = '低内存模式')
     parser.add_argument('--dtype', type = str, default = "auto", help = '权重类型 (float16, int8, int4, int4g)')
     parser.add_argument('--atype', type = str, default = "auto", help = '推理类型 (float32, float16)')
+    parser.add_argument('--max_history', type = int, default = 20, help = '对话保留的最大轮数 (run/chat, <=0 表示不限制)')
     parser.add_argument('--device', type = str, help = '使用的设备 (cuda, cpu, numa)')
     
     # MOE 参数
@@ -79,17 +80,91 @@ def add_server_args(parser):
     parser.add_argument("--think", type = str, default = "false", help = "Python后端思考模式")
     parser.add_argument("--show_input", action = 'store_true', help = "显示输入消息(调试用)")
     parser.add_argument("--dev_mode", action = 'store_true', help = "开发模式(启用调试接口)")
+    parser.add_argument("--sse_flush_ms", type = int, default = 5, help = "流式输出合并发送的最长等待(毫秒, 0为逐帧发送)")
+    parser.add_argument("--enable_cors", action = 'store_true', help = "启用CORS跨域支持(开发模式下默认启用)")
+
+# 字符串开关参数中表示“关闭”的取值（比较前先转小写）
+_FALSY = frozenset(("", "false", "0", "off"))
+
+def _truthy(value):
+    return value.lower() not in _FALSY
+
+# 默认开启思考模式的模型架构
+_THINKING_ARCHS = frozenset((
+    'Qwen3ForCausalLM', 'Qwen3MoeForCausalLM', 'Glm4MoeForCausalLM'
+))
+# MoE 模型架构（默认开启 cache_history）
+_MOE_ARCHS = frozenset((
+    'DeepseekV3ForCausalLM', 'DeepseekV2ForCausalLM', 'Qwen3MoeForCausalLM',
+    'MiniMaxM1ForCausalLM', 'MiniMaxText01ForCausalLM', 'HunYuanMoEV1ForCausalLM',
+    'Ernie4_5_MoeForCausalLM', 'PanguProMoEForCausalLM', 'Glm4MoeForCausalLM',
+    'Qwen3NextForCausalLM'
+))
+
+# 已解析的 config.json（按路径），下载 / 搜索后重复调用时不再重新解析
+_CONFIG_CACHE = {}
+
+def _json_loads(data):
+    """解析 JSON（有 orjson 时使用 orjson，可直接解析字节）"""
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.loads(data.decode("utf-8") if isinstance(data, bytes) else data)
+    return orjson.loads(data)
+
+def _load_json_file(path):
+    """读取 JSON 文件（有 orjson 时直接解析字节，省去解码为 str 的一步）"""
+    with open(path, "rb") as file:
+        return _json_loads(file.read())
+
+def _parse_device_map(device):
+    """解析 --device / --moe_device: 以 { 或 [ 开头时解析为 dict / list，否则按设备名原样返回"""
+    text = device.strip()
+    if (not text or text[0] not in "[{"):
+        return device
+    try:
+        device_map = _json_loads(text)
+    except ValueError:
+        # 兼容 Python 字面量写法，如 {'cuda':1,'cpu':2}
+        import ast
+        try:
+            device_map = ast.literal_eval(text)
+        except:
+            return device
+    if (isinstance(device_map, list) or isinstance(device_map, dict)):
+        return device_map
+    return device
+
+def _load_model_config(config_path):
+    config = _CONFIG_CACHE.get(config_path)
+    if config is None:
+        config = _load_json_file(config_path)
+        _CONFIG_CACHE[config_path] = config
+    return config
+
+def _find_model_config(model_path, ori_path):
+    """读取模型目录下的 config.json（不存在时退回 ori 目录），都没有或解析失败时返回 None"""
+    for config_dir in (model_path, ori_path):
+        if (not config_dir):
+            continue
+        try:
+            # 直接打开而不是先 exists 再打开，常见情况下只需一次系统调用
+            return _load_model_config(os.path.join(config_dir, "config.json"))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        except (OSError, ValueError):
+            return None
+    return None
 
 def make_normal_llm_model(args):
     if (args.model and args.model != ''):
         if (args.model.endswith(".json") and os.path.exists(args.model)):
-            import json
-            with open(args.model, "r", encoding = "utf-8") as file:
-                args_config = json.load(file)
-                for it in args_config.keys():
-                    if (it == "FASTLLM_USE_NUMA" or it == "FASTLLM_NUMA_THREADS"):
-                        os.environ[it] = str(args_config[it])
-                    setattr(args, it, args_config[it])
+            args_config = _load_json_file(args.model)
+            for it in args_config.keys():
+                if (it == "FASTLLM_USE_NUMA" or it == "FASTLLM_NUMA_THREADS"):
+                    os.environ[it] = str(args_config[it])
+                setattr(args, it, args_config[it])
                 
     usenuma = False
     try:
@@ -121,30 +196,16 @@ def make_normal_llm_model(args):
         downloader.run()
         args.path = str(downloader.local_dir)
     
-    config_path = os.path.join(args.path, "config.json")
-    if (not(os.path.exists(config_path)) and args.ori != "" and os.path.exists(os.path.join(args.ori, "config.json"))):
-        config_path = os.path.join(args.ori, "config.json")
-    if (os.path.exists(config_path)):
+    config = _find_model_config(args.path, args.ori)
+    if (config is not None):
         try:
-            import json
-            with open(config_path, "r", encoding="utf-8") as file:
-                config = json.load(file)
-            if (config["architectures"][0] == 'Qwen3ForCausalLM' or config["architectures"][0] == 'Qwen3MoeForCausalLM' or
-                config["architectures"][0] == 'Glm4MoeForCausalLM'):
+            arch = config["architectures"][0]
+            if (arch in _THINKING_ARCHS):
                 if (args.enable_thinking == ""):
                     args.enable_thinking = "true"
             # MoE 模型自动配置 cache_history
             # 注意: device/moe_device 的自动配置已移至 C++ 底层 (basellm::ApplyAutoDeviceMap)
-            if (config["architectures"][0] == 'DeepseekV3ForCausalLM' or 
-                config["architectures"][0] == 'DeepseekV2ForCausalLM' or 
-                config["architectures"][0] == 'Qwen3MoeForCausalLM' or 
-                config["architectures"][0] == 'MiniMaxM1ForCausalLM' or 
-                config["architectures"][0] == 'MiniMaxText01ForCausalLM' or 
-                config["architectures"][0] == 'HunYuanMoEV1ForCausalLM' or 
-                config["architectures"][0] == 'Ernie4_5_MoeForCausalLM' or 
-                config["architectures"][0] == 'PanguProMoEForCausalLM' or
-                config["architectures"][0] == 'Glm4MoeForCausalLM' or 
-                config["architectures"][0] == 'Qwen3NextForCausalLM'):
+            if (arch in _MOE_ARCHS):
                 if (args.cache_history == ""):
                     args.cache_history = "true"
             if ("quantization_config" in config):
@@ -193,38 +254,20 @@ def make_normal_llm_model(args):
     args._parsed_moe_device_map = None
     
     if (args.device and args.device != ""):
-        try:
-            import ast
-            device_map = ast.literal_eval(args.device)
-            if (isinstance(device_map, list) or isinstance(device_map, dict)):
-                llm.set_device_map(device_map)
-                args._parsed_device_map = device_map
-            else:
-                llm.set_device_map(args.device)
-                args._parsed_device_map = args.device
-        except:
-            llm.set_device_map(args.device)
-            args._parsed_device_map = args.device
+        device_map = _parse_device_map(args.device)
+        llm.set_device_map(device_map)
+        args._parsed_device_map = device_map
     if (args.moe_device and args.moe_device != ""):
-        try:
-            import ast
-            moe_device_map = ast.literal_eval(args.moe_device)
-            if (isinstance(moe_device_map, list) or isinstance(moe_device_map, dict)):
-                llm.set_device_map(moe_device_map, True)
-                args._parsed_moe_device_map = moe_device_map
-            else:
-                llm.set_device_map(args.moe_device, True)
-                args._parsed_moe_device_map = args.moe_device
-        except:
-            llm.set_device_map(args.moe_device, True)
-            args._parsed_moe_device_map = args.moe_device
+        moe_device_map = _parse_device_map(args.moe_device)
+        llm.set_device_map(moe_device_map, True)
+        args._parsed_moe_device_map = moe_device_map
     llm.set_cpu_threads(args.threads)
     llm.set_cpu_low_mem(args.low)
     if (args.cuda_embedding):
         llm.set_cuda_embedding(True)
-    if (args.cuda_shared_expert.lower() not in ["", "false", "0", "off"]):
+    if (_truthy(args.cuda_shared_expert)):
         llm.set_cuda_shared_expert(True)
-    if (args.enable_amx.lower() not in ["", "false", "0", "off"]):
+    if (_truthy(args.enable_amx)):
         llm.set_enable_amx(True)
     graph = None
     if (args.custom != ""):
@@ -254,12 +297,12 @@ def make_normal_llm_model(args):
     load_elapsed = time.time() - load_start
     console.success(f"模型加载完成 ({load_elapsed:.0f}s)")
     
-    if (args.enable_thinking.lower() in ["", "false", "0", "off"]):
+    if (not _truthy(args.enable_thinking)):
         model.enable_thinking = False
     model.set_atype(args.atype)
-    if (args.cache_history.lower() not in ["", "false", "0", "off"]):
+    if (_truthy(args.cache_history)):
         model.set_save_history(True)
-        if (args.cache_fast in ["", "false", "0", "off"]):
+        if (not _truthy(args.cache_fast)):
             llm.set_cpu_historycache(True)
     if (args.moe_experts > 0):
         model.set_moe_experts(args.moe_experts)
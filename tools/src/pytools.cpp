@@ -641,6 +641,32 @@ extern "C" {
         return fvalue;
     }
 
+    // 批量 embedding: tokens 为 batch 个序列按 seqLens 依次拼接, 返回 batch * embeddingLen 个 float
+    DLL_EXPORT float* embedding_tokens_batch(int modelId, int batch, int *seqLens, int *tokens, bool normalize, int *embeddingLen) {
+        fastllm::BertModel *model = (fastllm::BertModel*)models.GetModel(modelId);
+        std::vector <std::vector <int> > inputIds;
+        inputIds.resize(batch);
+        int pos = 0;
+        for (int i = 0; i < batch; i++) {
+            for (int j = 0; j < seqLens[i]; j++) {
+                inputIds[i].push_back(tokens[pos++]);
+            }
+        }
+        std::vector <std::vector <float> > result = model->EmbeddingSentenceBatch(inputIds, normalize);
+        int len = result.empty() ? 0 : result[0].size();
+        float *fvalue = new float[batch * len];
+        for (int i = 0; i < batch; i++) {
+            memcpy(fvalue + i * len, result[i].data(), len * sizeof(float));
+        }
+        *embeddingLen = len;
+        return fvalue;
+    }
+
+    // 释放由上面接口 new[] 出来的 float 数组
+    DLL_EXPORT void free_float_array(float *data) {
+        delete[] data;
+    }
+
     DLL_EXPORT float* reranker_compute_score(int modelId, int batch, int *seqLens, int *tokens) {
         fastllm::BertModel *model = (fastllm::BertModel*)models.GetModel(modelId);
         std::vector <std::vector <int> > inputIds;